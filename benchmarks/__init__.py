@@ -0,0 +1 @@
+""" Benchmarks and synthetic scene generator, run from the repository root with python -m benchmarks.run """
@@ -0,0 +1,86 @@
+"""
+Compare the memory used to keep many parsed headers around, as parsers, as plain dicts and as HeaderRecord.
+Every header is parsed separately, like headers of different files would be.
+
+Usage:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --count 50000 --fileinfo-count 50
+"""
+import os
+import gc
+import argparse
+import tempfile
+import tracemalloc
+
+from benchmarks import generate
+from maya_header_parser import parser as mh_parser, record
+
+
+def _parser(filename):
+    maya_file = mh_parser.maya_header_parser(filename)
+    maya_file.get_maya_version()
+    maya_file.get_all_fileinfo()
+    maya_file.get_all_plugins()
+    maya_file.get_units()
+    return maya_file
+
+
+def _dicts(filename):
+    maya_file = mh_parser.maya_header_parser(filename)
+    return {
+        "version": maya_file.get_maya_version(),
+        "units": maya_file.get_units(),
+        "plugins": maya_file.get_all_plugins(),
+        "fileinfo": maya_file.get_all_fileinfo(),
+    }
+
+
+def _record(filename):
+    return record.read_header_record(filename)
+
+
+LAYOUTS = {
+    "parser": _parser,
+    "dicts": _dicts,
+    "record": _record,
+}
+
+
+def bench_memory(filename, layout, count) -> int:
+    """ Get the bytes allocated per header when count headers are kept """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        headers = [LAYOUTS[layout](filename) for _ in range(count)]
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    del headers
+    return size // count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--count", type=int, default=5000)
+    arg_parser.add_argument("--fileinfo-count", type=int, default=20)
+    arg_parser.add_argument("--plugin-count", type=int, default=10)
+    arg_parser.add_argument("--reference-count", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ("mb", "ma"):
+            filename = os.path.join(directory, f"scene.{extension}")
+            generate.write_scene(filename, fileinfo_count=args.fileinfo_count, plugin_count=args.plugin_count,
+                                 reference_count=args.reference_count, body_size=64 * 1024)
+            print(os.path.basename(filename))
+            baseline = None
+            for layout in LAYOUTS:
+                size = bench_memory(filename, layout, args.count)
+                baseline = baseline or size
+                print(f"  {layout:<8}{size:>10} bytes/header  {size / baseline:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark header packing for binary and ascii files with a growing number of fileinfo records.
+The time per record should stay about the same for every record count if packing scales linearly.
+
+Usage:
+    python -m benchmarks.bench_pack
+    python -m benchmarks.bench_pack --counts 10000 100000 1000000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from benchmarks import generate
+from maya_header_parser import parser as mh_parser
+
+
+def bench_pack(filename, count, repeat):
+    maya_file = mh_parser.maya_header_parser(filename)
+    for index in range(count):
+        maya_file.set_fileinfo(f"asset_{index:07d}", f"/project/assets/asset_{index:07d}/publish/v001.ma")
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        maya_file._pack_header_data()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ("mb", "ma"):
+            filename = os.path.join(directory, f"scene.{extension}")
+            generate.write_scene(filename, fileinfo_count=1, plugin_count=0, body_size=0)
+            print(os.path.basename(filename))
+            for count in args.counts:
+                seconds = bench_pack(filename, count, args.repeat)
+                print(f"  {count:>9} records  {seconds * 1000:10.1f} ms  {seconds / count * 1e9:8.1f} ns/record")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Generate synthetic maya scenes with configurable header and body sizes.
+The files only contain what the header parser cares about, the body is filler data in a valid layout.
+
+Usage:
+    python -m benchmarks.generate scene.mb --fileinfo-count 1000 --body-size 1GB
+    python -m benchmarks.generate scene.ma --reference-count 500 --body-size 64MB
+    python -m benchmarks.generate scene.mb --reference-count 500
+"""
+import re
+import math
+import struct
+import argparse
+
+# Size of each filler chunk (.mb) or block of nodes (.ma) in the body
+BODY_BLOCK_SIZE = 1024 * 1024
+
+_CHUNK_STRUCT = struct.Struct(">4sxxxxQ")
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(size) -> int:
+    """ Convert a size like 512, "64KB" or "1.5GB" to bytes """
+    if isinstance(size, int):
+        return size
+
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?B?)\s*", size.upper())
+    if not match:
+        raise ValueError(f"Invalid size {size}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def _align8(size):
+    return math.ceil(size / 8) * 8
+
+
+def _pack_record(typeid: bytes, data: bytes) -> bytes:
+    return _CHUNK_STRUCT.pack(typeid, len(data)) + data + b"\x00" * (_align8(len(data)) - len(data))
+
+
+def _value(prefix, index, value_length):
+    value = f"{prefix}_{index:06d}_"
+    return (value * math.ceil(value_length / len(value)))[:value_length]
+
+
+def get_references(reference_count=0, references=None) -> list:
+    """ Get the (path, depth) of the references to write, reference_count generated top level references if references isn't given """
+    if references is not None:
+        return list(references)
+    return [(f"/project/assets/asset_{index:06d}/publish/asset_{index:06d}.ma", 1) for index in range(reference_count)]
+
+
+def _reference_args(index, path, depth=None, top_level=False, file_type="mayaAscii") -> list:
+    """ Arguments of the file command of a reference, a -rdi line when depth is given and a -r line for top_level """
+    args = ["-rdi", str(depth)] if depth is not None else ["-r"]
+    args += ["-ns", f"asset_{index:06d}"]
+    if top_level:
+        args += ["-dr", "1"]
+    return args + ["-rfn", f"asset_{index:06d}RN", "-typ", file_type, path]
+
+
+def pack_binary_references(references) -> bytes:
+    """
+    Pack the reference chunks that follow the HEAD chunk, an FRDI chunk for every reference in the hierarchy and an
+    FREF chunk for each top level reference. The values are null separated file command arguments
+    """
+    def pack(typeid, args):
+        return _pack_record(typeid, "".join(f"{arg}\x00" for arg in args).encode())
+
+    chunks = [pack(b"FRDI", _reference_args(index, path, depth, file_type="mayaBinary")) for index, (path, depth) in enumerate(references)]
+    chunks += [
+        pack(b"FREF", _reference_args(index, path, top_level=True, file_type="mayaBinary"))
+        for index, (path, depth) in enumerate(references) if depth == 1
+    ]
+    return b"".join(chunks)
+
+
+def pack_binary_header(maya_version=2022, fileinfo_count=10, plugin_count=5, value_length=32) -> bytes:
+    """ Pack HEAD chunk records in the same order maya writes them """
+    head = _pack_record(b"VERS", f"{maya_version}\x00".encode())
+    head += _pack_record(b"UVER", b"undef\x00")
+    head += _pack_record(b"MADE", b"undef\x00")
+    head += _pack_record(b"CHNG", b"Mon Jan 01 00:00:00 2024\x00")
+    head += _pack_record(b"ICON", b"\x00")
+    head += _pack_record(b"INFO", b"\x00")
+    head += _pack_record(b"OBJN", b"\x00")
+    head += _pack_record(b"INCL", b"\x00")
+    head += _pack_record(b"LUNI", b"cm\x00")
+    head += _pack_record(b"TUNI", b"film\x00")
+    head += _pack_record(b"AUNI", b"deg\x00")
+    head += b"".join(
+        _pack_record(b"FINF", f"info_{index:06d}\x00{_value('value', index, value_length)}\x00".encode())
+        for index in range(max(fileinfo_count, 1))
+    )
+    head += b"".join(
+        _pack_record(b"PLUG", f"plugin_{index:04d}\x00{index}.0.0\x00".encode())
+        for index in range(plugin_count)
+    )
+    return head
+
+
+def write_binary_scene(filename, maya_version=2022, fileinfo_count=10, plugin_count=5, value_length=32, reference_count=0,
+                       body_size=BODY_BLOCK_SIZE, references=None):
+    """
+    Write a FOR8 maya binary file.
+    The body is made of FOR8 XFRM groups that each hold one CREA chunk of filler data, written one block at a time.
+    :param reference_count: Number of referenced files, each adds an FRDI and an FREF chunk after the HEAD chunk
+    :param body_size: Approximate size in bytes of everything after the HEAD chunk
+    :param references: List of (path, depth) to write instead of reference_count generated references, nested
+        references follow their parent with a higher depth
+    """
+    head = pack_binary_header(maya_version, fileinfo_count, plugin_count, value_length)
+    head_chunk = _CHUNK_STRUCT.pack(b"FOR8", len(head) + 4) + b"HEAD" + head
+    head_chunk += pack_binary_references(get_references(reference_count, references))
+
+    # Every group is: group header (16) + form type (4) + data chunk header (16) + payload, padded to 8 bytes
+    group_overhead = _CHUNK_STRUCT.size * 2 + 4
+    block_count = max(1, math.ceil(body_size / BODY_BLOCK_SIZE))
+    payload_size = _align8(max(8, body_size // block_count - group_overhead - 4)) + 4
+    group_size = _align8(group_overhead + payload_size)
+    main_length = 4 + len(head_chunk) + group_size * block_count
+
+    payload = (b"maya_header_parser benchmark data" * math.ceil(payload_size / 33))[:payload_size]
+    group = (
+        _CHUNK_STRUCT.pack(b"FOR8", group_size - _CHUNK_STRUCT.size) + b"XFRM" +
+        _CHUNK_STRUCT.pack(b"CREA", payload_size) + payload
+    )
+    group += b"\x00" * (group_size - len(group))
+
+    with open(filename, "wb") as file_obj:
+        file_obj.write(_CHUNK_STRUCT.pack(b"FOR8", main_length) + b"Maya" + head_chunk)
+        for _ in range(block_count):
+            file_obj.write(group)
+
+
+def write_ascii_scene(filename, maya_version=2022, fileinfo_count=10, plugin_count=5, value_length=32, reference_count=0,
+                      body_size=BODY_BLOCK_SIZE, references=None):
+    """
+    Write a maya ascii file
+    :param reference_count: Number of referenced files, each adds a file -rdi and a file -r line
+    :param body_size: Approximate size in bytes of the createNode part, written one block at a time
+    :param references: List of (path, depth) to write instead of reference_count generated references
+    """
+    header = [
+        f"//Maya ASCII {maya_version} scene\n",
+        "//Name: benchmark.ma\n",
+        "//Last modified: Mon, Jan 01, 2024 00:00:00 AM\n",
+        "//Codeset: UTF-8\n",
+    ]
+    references = get_references(reference_count, references)
+
+    def file_line(args):
+        return "file " + " ".join(f'"{arg}"' if not arg.startswith("-") and not arg.isdigit() else arg for arg in args) + ";\n"
+
+    header += [file_line(_reference_args(index, path, depth)) for index, (path, depth) in enumerate(references)]
+    header += [file_line(_reference_args(index, path, top_level=True)) for index, (path, depth) in enumerate(references) if depth == 1]
+    header.append(f'requires maya "{maya_version}";\n')
+    header += [f'requires "plugin_{index:04d}" "{index}.0.0";\n' for index in range(plugin_count)]
+    header.append("currentUnit -l centimeter -a degree -t film;\n")
+    header += [f'fileInfo "info_{index:06d}" "{_value("value", index, value_length)}";\n' for index in range(fileinfo_count)]
+
+    node = 'createNode transform -n "node_{:08d}";\n\trename -uid "00000000-0000-0000-0000-000000000000";\n\tsetAttr ".t" -type "double3" 0 1 0 ;\n'
+    node_size = len(node.format(0))
+    node_count = max(1, body_size // node_size)
+
+    with open(filename, "w", encoding="utf-8", newline="\n") as file_obj:
+        file_obj.writelines(header)
+        for block_start in range(0, node_count, BODY_BLOCK_SIZE // node_size):
+            block_end = min(node_count, block_start + BODY_BLOCK_SIZE // node_size)
+            file_obj.write("".join(node.format(index) for index in range(block_start, block_end)))
+        file_obj.write("// End of benchmark.ma\n")
+
+
+def write_scene(filename, **kwargs):
+    """ Write a binary or ascii scene depending on the extension """
+    if str(filename).endswith(".mb"):
+        write_binary_scene(filename, **kwargs)
+    else:
+        write_ascii_scene(filename, **kwargs)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("filename", help="Output file, .mb for binary otherwise ascii")
+    arg_parser.add_argument("--maya-version", type=int, default=2022)
+    arg_parser.add_argument("--fileinfo-count", type=int, default=10)
+    arg_parser.add_argument("--plugin-count", type=int, default=5)
+    arg_parser.add_argument("--value-length", type=int, default=32)
+    arg_parser.add_argument("--reference-count", type=int, default=0)
+    arg_parser.add_argument("--body-size", default="1MB")
+    args = arg_parser.parse_args()
+
+    write_scene(
+        args.filename,
+        maya_version=args.maya_version,
+        fileinfo_count=args.fileinfo_count,
+        plugin_count=args.plugin_count,
+        value_length=args.value_length,
+        reference_count=args.reference_count,
+        body_size=parse_size(args.body_size),
+    )
+
+
+if __name__ == "__main__":
+    main()
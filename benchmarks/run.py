@@ -0,0 +1,230 @@
+"""
+Time parsing, header access, saving and batch scanning on synthetic scenes.
+Every case runs in a fresh process, so the reported peak RSS belongs to that case only.
+Syscall counts and bytes read/written come from /proc/self/io and are only reported on Linux.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --body-size 1GB --fileinfo-count 5000 --save-baseline baseline.json
+    python -m benchmarks.run --compare baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from concurrent import futures
+
+try:
+    import resource
+except ImportError:
+    # Not available on windows, peak rss isn't reported there
+    resource = None
+
+from benchmarks import generate
+from maya_header_parser import parser, peek, scan
+
+# Relative slow down before a case is reported as a regression when comparing against a baseline
+REGRESSION_THRESHOLD = 0.10
+
+
+def _parse(files, extension):
+    parser.maya_header_parser(files[extension])
+
+
+def _get_all(files, extension):
+    maya_file = parser.maya_header_parser(files[extension])
+    maya_file.get_maya_version()
+    maya_file.get_all_fileinfo()
+    maya_file.get_all_plugins()
+    maya_file.get_units()
+
+
+def _peek_version(files, extension):
+    peek.peek_version(files[extension])
+
+
+def _save_as(files, extension):
+    maya_file = parser.maya_header_parser(files[extension])
+    maya_file.set_fileinfo("benchmark", "stamp")
+    maya_file.save_as(files[f"{extension}_out"])
+
+
+def _save_in_place(files, extension):
+    maya_file = parser.maya_header_parser(files[f"{extension}_padded"])
+    maya_file.set_fileinfo("benchmark", str(time.perf_counter_ns()))
+    maya_file.save(in_place=True)
+
+
+def _scan(files, extension):
+    for _ in scan.scan_headers(files["scan_dir"], workers=files["scan_workers"]):
+        pass
+
+
+# name: (function, extension, whether the whole file is processed)
+CASES = {
+    "parse_mb": (_parse, "mb", False),
+    "parse_ma": (_parse, "ma", False),
+    "get_all_mb": (_get_all, "mb", False),
+    "get_all_ma": (_get_all, "ma", False),
+    "peek_version_mb": (_peek_version, "mb", False),
+    "peek_version_ma": (_peek_version, "ma", False),
+    "save_as_mb": (_save_as, "mb", True),
+    "save_as_ma": (_save_as, "ma", True),
+    "save_in_place_mb": (_save_in_place, "mb", False),
+    "save_in_place_ma": (_save_in_place, "ma", False),
+    "scan": (_scan, None, False),
+}
+
+
+def _read_proc_io() -> dict:
+    """ Get read/write syscall counts and bytes of the current process, empty if not on Linux """
+    try:
+        with open("/proc/self/io") as file_obj:
+            return {key: int(value) for key, value in (line.split(": ") for line in file_obj)}
+    except OSError:
+        return {}
+
+
+def _run_case(name, files, repeat) -> dict:
+    """ Run one case, this is called in its own process """
+    func, extension, whole_file = CASES[name]
+
+    # Warm up imports and the page cache so the first repeat isn't an outlier
+    func(files, extension)
+
+    io_before = _read_proc_io()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(files, extension)
+    seconds = (time.perf_counter() - start) / repeat
+    io_after = _read_proc_io()
+
+    result = {
+        "seconds": seconds,
+        "ops_per_second": 1 / seconds if seconds else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+    }
+    if whole_file:
+        result["mb_per_second"] = os.path.getsize(files[extension]) / 1024 ** 2 / seconds
+    if name == "scan":
+        result["files_per_second"] = files["scan_files"] / seconds
+
+    for key, result_key in (("syscr", "read_syscalls"), ("syscw", "write_syscalls"), ("rchar", "read_bytes"), ("wchar", "write_bytes")):
+        if key in io_before:
+            result[result_key] = (io_after[key] - io_before[key]) / repeat
+
+    return result
+
+
+def generate_files(directory, args) -> dict:
+    """ Write all scenes used by the cases """
+    scene_args = dict(
+        fileinfo_count=args.fileinfo_count,
+        plugin_count=args.plugin_count,
+        value_length=args.value_length,
+        reference_count=args.reference_count,
+    )
+    files = {"scan_dir": os.path.join(directory, "scan"), "scan_files": args.scan_files, "scan_workers": args.scan_workers}
+    for extension in ("mb", "ma"):
+        files[extension] = os.path.join(directory, f"scene.{extension}")
+        files[f"{extension}_out"] = os.path.join(directory, f"scene_out.{extension}")
+        files[f"{extension}_padded"] = os.path.join(directory, f"scene_padded.{extension}")
+        generate.write_scene(files[extension], body_size=args.body_size, **scene_args)
+
+        # In place saves need reserved space in the header
+        generate.write_scene(files[f"{extension}_padded"], body_size=args.body_size, **scene_args)
+        parser.maya_header_parser(files[f"{extension}_padded"], header_padding=4096).save()
+
+    os.makedirs(files["scan_dir"])
+    small_scenes = {}
+    for extension in ("mb", "ma"):
+        small_scenes[extension] = os.path.join(directory, f"small.{extension}")
+        generate.write_scene(small_scenes[extension], body_size=64 * 1024, **scene_args)
+
+    for index in range(args.scan_files):
+        extension = ("mb", "ma")[index % 2]
+        shutil.copyfile(small_scenes[extension], os.path.join(files["scan_dir"], f"scene_{index:06d}.{extension}"))
+
+    return files
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD) -> list:
+    """ Print the change against a baseline, returns the names of the cases that got slower than the threshold """
+    regressions = []
+    print(f"\n{'case':<20}{'baseline ms':>14}{'current ms':>14}{'change':>10}{'rss change':>12}")
+    for name, result in results.items():
+        baseline_result = baseline.get("results", {}).get(name)
+        if not baseline_result:
+            print(f"{name:<20}{'-':>14}{result['seconds'] * 1000:>14.3f}")
+            continue
+
+        change = result["seconds"] / baseline_result["seconds"] - 1
+        rss_change = f"{result['peak_rss_kb'] / baseline_result['peak_rss_kb'] - 1:+.1%}" if result["peak_rss_kb"] and baseline_result["peak_rss_kb"] else "-"
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        print(f"{name:<20}{baseline_result['seconds'] * 1000:>14.3f}{result['seconds'] * 1000:>14.3f}{change:>+10.1%}{rss_change:>12}{flag}")
+
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--fileinfo-count", type=int, default=100)
+    arg_parser.add_argument("--plugin-count", type=int, default=10)
+    arg_parser.add_argument("--value-length", type=int, default=64)
+    arg_parser.add_argument("--reference-count", type=int, default=50)
+    arg_parser.add_argument("--body-size", type=generate.parse_size, default="64MB")
+    arg_parser.add_argument("--scan-files", type=int, default=1000)
+    arg_parser.add_argument("--scan-workers", type=int, default=8)
+    arg_parser.add_argument("--work-dir", help="Directory to write the scenes to, defaults to a temporary directory")
+    arg_parser.add_argument("--save-baseline", help="Write the results to this json file")
+    arg_parser.add_argument("--compare", help="Compare the results with a baseline json file")
+    arg_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = arg_parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="maya_header_parser_bench_", dir=args.work_dir)
+    try:
+        print(f"Generating scenes in {directory}")
+        files = generate_files(directory, args)
+
+        results = {}
+        print(f"\n{'case':<20}{'ms/op':>12}{'ops/s':>12}{'throughput':>16}{'peak rss MB':>13}{'read sc':>9}{'write sc':>9}")
+        for name in args.cases:
+            with futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                result = executor.submit(_run_case, name, files, 1 if name == "scan" else args.repeat).result()
+            results[name] = result
+
+            throughput = "-"
+            if "mb_per_second" in result:
+                throughput = f"{result['mb_per_second']:.1f} MB/s"
+            elif "files_per_second" in result:
+                throughput = f"{result['files_per_second']:.1f} files/s"
+            peak_rss = f"{result['peak_rss_kb'] / 1024:.1f}" if result["peak_rss_kb"] else "-"
+            print(
+                f"{name:<20}{result['seconds'] * 1000:>12.3f}{result['ops_per_second']:>12.1f}{throughput:>16}{peak_rss:>13}"
+                f"{result.get('read_syscalls', 0):>9.0f}{result.get('write_syscalls', 0):>9.0f}"
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    output = {"config": {key: value for key, value in vars(args).items() if key not in ("save_baseline", "compare")}, "results": results}
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file_obj:
+            json.dump(output, file_obj, indent=4)
+
+    if args.compare:
+        with open(args.compare) as file_obj:
+            if compare(results, json.load(file_obj), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
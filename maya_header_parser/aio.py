@@ -0,0 +1,99 @@
+"""
+Asyncio front end for reading headers without blocking the event loop.
+The blocking reads run on one bounded thread pool that is shared by all callers, so many concurrent requests can't
+open more files at the same time than there are workers.
+
+Example:
+    result = await aio.read_header("C:/project/scenes/shot_010.mb")
+
+    async for result in aio.iter_headers(["C:/project/scenes"], concurrency=64):
+        print(result.path, result.version, result.error)
+"""
+import os
+import asyncio
+import itertools
+import threading
+from concurrent import futures
+
+from maya_header_parser import scan
+
+# Worker threads of the shared executor, header reads are io bound so this is more than the number of cpus
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Max number of files read at the same time by one iter_headers call
+DEFAULT_CONCURRENCY = 32
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> futures.ThreadPoolExecutor:
+    """ Get the shared executor, it's created with DEFAULT_WORKERS threads the first time it's needed """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix="maya_header_parser")
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    """ Shut down the shared executor, a new one is created if it's needed again """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def read_header(path, executor: futures.Executor = None, read_func=scan.read_header) -> scan.ScanResult:
+    """
+    Read the header of one file on the executor, errors are returned in the result like scan.read_header.
+    Cancelling the call drops the read if it hasn't started yet, a read that already started finishes in the background.
+    :param path: Maya file
+    :param executor: Executor to run the read on, defaults to the shared executor
+    :param read_func: Function that reads one path and returns the result
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or get_executor(), read_func, path)
+
+
+def _next_paths(path_iterator, count) -> list:
+    return list(itertools.islice(path_iterator, count))
+
+
+async def iter_headers(paths_or_roots, concurrency: int = DEFAULT_CONCURRENCY, executor: futures.Executor = None,
+                       read_func=scan.read_header):
+    """
+    Read headers of many files, results are yielded in the order they finish.
+    Directories are walked lazily on the event loop's default executor, only as far as needed to keep
+    concurrency files in flight. Reads that are still queued are cancelled when the iteration stops early or the
+    calling task is cancelled.
+    :param paths_or_roots: File/directory path or a list of paths, see scan.iter_maya_files
+    :param concurrency: Max number of files queued or being read at the same time by this call
+    :param executor: Executor to run the reads on, defaults to the shared executor
+    :param read_func: Function that reads one path and returns the result
+    :return: Async iterator of ScanResult(path, version, fileinfo, plugins, units, error)
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_executor()
+    path_iterator = scan.iter_maya_files(paths_or_roots)
+    has_paths = True
+    pending = set()
+    try:
+        while True:
+            if has_paths and len(pending) < concurrency:
+                count = concurrency - len(pending)
+                paths = await loop.run_in_executor(None, _next_paths, path_iterator, count)
+                has_paths = len(paths) == count
+                pending.update(loop.run_in_executor(executor, read_func, path) for path in paths)
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
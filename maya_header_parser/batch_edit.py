@@ -0,0 +1,207 @@
+"""
+Apply the same header edits to many files on a worker pool, with a journal so an interrupted run can be resumed.
+
+Example:
+    operations = [
+        EditOperation("set_plugin", ("mtoa", "5.3.0")),
+        EditOperation("set_fileinfo", ("BuildId", "1234")),
+    ]
+    for result in batch_edit(["C:/project/scenes"], operations, journal="C:/jobs/mtoa_bump.jsonl", workers=16):
+        print(result.path, result.status, result.error)
+
+Command line:
+    python -m maya_header_parser.batch_edit C:/project/scenes --set-plugin mtoa 5.3.0 --journal mtoa_bump.jsonl
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import functools
+from collections import namedtuple
+
+from maya_header_parser import parser, scan
+
+log = logging.getLogger("maya_header_parser")
+
+# Parser methods that can be used as edit operations and their number of arguments
+OPERATIONS = {
+    "set_fileinfo": 2,
+    "remove_fileinfo": 1,
+    "set_plugin": 2,
+    "remove_plugin": 1,
+    "set_maya_version": 1,
+}
+
+STARTED = "started"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+EditOperation = namedtuple("EditOperation", ["method", "args"])
+EditResult = namedtuple("EditResult", ["path", "status", "error"])
+
+
+def validate_operations(operations) -> list:
+    """ Check that all operations are supported, returns them as EditOperation """
+    validated = []
+    for method, args in operations:
+        if method not in OPERATIONS:
+            raise ValueError(f"Unsupported edit operation {method}, use one of {list(OPERATIONS)}")
+        if len(args) != OPERATIONS[method]:
+            raise ValueError(f"{method} takes {OPERATIONS[method]} arguments, got {len(args)}")
+        if method == "set_maya_version":
+            args = (int(args[0]),)
+        validated.append(EditOperation(method, tuple(args)))
+    return validated
+
+
+def apply_edits(path, operations, in_place=False) -> EditResult:
+    """
+    Apply edit operations to one file, files that already match the result are not written
+    :param path: Maya file
+    :param operations: List of EditOperation
+    :param in_place: Only overwrite the header when the new header fits, see ParserInterface.save. The header is
+        then written in several parts, a process that dies in between leaves a broken header behind
+    :return: EditResult(path, status, error), errors are returned instead of raised
+    """
+    try:
+        maya_file = parser.open_maya_file(path)
+
+        for method, args in operations:
+            getattr(maya_file, method)(*args)
+
+        if not maya_file.save(in_place=in_place):
+            return EditResult(path=path, status=SKIPPED, error=None)
+        return EditResult(path=path, status=DONE, error=None)
+    except Exception as error:
+        log.debug(f"Failed to edit {path}: {error}")
+        return EditResult(path=path, status=FAILED, error=repr(error))
+
+
+class Journal:
+    """
+    Append only json lines log of a batch edit.
+    The first line holds the operations, then every file gets a started line before it's edited and a
+    done/skipped/failed line when it's finished. Files that finished are skipped when the journal is resumed.
+    """
+
+    def __init__(self, filename, operations):
+        self.filename = filename
+        self.finished = {}
+
+        operations = [list(operation) for operation in operations]
+        if os.path.exists(filename):
+            with open(filename) as file_obj:
+                for line_number, line in enumerate(file_obj):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line may be cut short if the previous run died while writing it
+                        continue
+
+                    if line_number == 0:
+                        if json.loads(json.dumps(operations)) != entry.get("operations"):
+                            raise ValueError(f"Journal {filename} was written for other operations: {entry.get('operations')}")
+                    elif entry["status"] != STARTED:
+                        self.finished[entry["path"]] = entry["status"]
+
+            self._file_obj = open(filename, "a")
+        else:
+            self._file_obj = open(filename, "w")
+            self._write({"operations": operations})
+
+    def _write(self, entry):
+        self._file_obj.write(json.dumps(entry) + "\n")
+        self._file_obj.flush()
+
+    def started(self, path):
+        self._write({"path": path, "status": STARTED})
+
+    def finish(self, result: EditResult):
+        self.finished[result.path] = result.status
+        self._write(result._asdict())
+
+    def close(self):
+        self._file_obj.close()
+
+
+def batch_edit(paths_or_roots, operations, journal: str = None, workers: int = None, executor="thread", in_place=False,
+               retry_failed=False):
+    """
+    Apply the same edit operations to many files in parallel
+    :param paths_or_roots: File/directory path or a list of paths, see scan.iter_maya_files
+    :param operations: List of (method, args) where method is one of OPERATIONS, for example ("set_plugin", ("mtoa", "5.3.0"))
+    :param journal: Json lines file that logs the progress, running again with the same journal resumes the job
+    :param workers: Number of worker threads/processes
+    :param executor: "thread" or "process"
+    :param in_place: Only overwrite the header when the new header fits, see apply_edits. By default every file is
+        written to a temporary file that replaces it, so a job that is interrupted never leaves a broken file behind
+    :param retry_failed: Run files again that failed in an earlier run of the journal
+    :return: Iterator of EditResult(path, status, error) in the order the files finish
+    """
+    operations = validate_operations(operations)
+    job_journal = Journal(journal, operations) if journal else None
+
+    def pending_paths():
+        for path in scan.iter_maya_files(paths_or_roots):
+            if job_journal:
+                status = job_journal.finished.get(path)
+                if status and (status != FAILED or not retry_failed):
+                    continue
+                job_journal.started(path)
+            yield path
+
+    try:
+        edit_func = functools.partial(apply_edits, operations=operations, in_place=in_place)
+        for result in scan.scan_headers(pending_paths(), workers=workers, executor=executor, read_func=edit_func):
+            if job_journal:
+                job_journal.finish(result)
+            yield result
+    finally:
+        if job_journal:
+            job_journal.close()
+
+
+class _AppendOperation(argparse.Action):
+    """ Collect all operation arguments in one list so they are applied in the order they were given """
+
+    def __call__(self, arg_parser, namespace, values, option_string=None):
+        operations = getattr(namespace, self.dest) or []
+        operations.append((option_string.lstrip("-").replace("-", "_"), tuple(values)))
+        setattr(namespace, self.dest, operations)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("paths", nargs="+", help="Maya files or directories to search for maya files")
+    for method, arg_count in OPERATIONS.items():
+        metavar = ("NAME", "VALUE") if arg_count == 2 else ("VERSION",) if method == "set_maya_version" else ("NAME",)
+        arg_parser.add_argument(f"--{method.replace('_', '-')}", nargs=arg_count, metavar=metavar, dest="operations", action=_AppendOperation)
+    arg_parser.add_argument("--journal", help="Journal file, run again with the same journal to resume")
+    arg_parser.add_argument("--workers", type=int)
+    arg_parser.add_argument("--executor", choices=list(scan.EXECUTORS), default="thread")
+    arg_parser.add_argument("--in-place", action="store_true",
+                            help="Only overwrite the header when it fits, faster but not safe to interrupt")
+    arg_parser.add_argument("--retry-failed", action="store_true", help="Run files again that failed in an earlier run")
+    args = arg_parser.parse_args(argv)
+
+    if not args.operations:
+        arg_parser.error("No edit operations given")
+
+    counts = {DONE: 0, SKIPPED: 0, FAILED: 0}
+    try:
+        for result in batch_edit(args.paths, args.operations, journal=args.journal, workers=args.workers, executor=args.executor,
+                                 in_place=args.in_place, retry_failed=args.retry_failed):
+            counts[result.status] += 1
+            if result.error:
+                print(f"{result.path}: {result.error}", file=sys.stderr)
+    except ValueError as error:
+        arg_parser.error(str(error))
+
+    print(f"{counts[DONE]} edited, {counts[SKIPPED]} already up to date, {counts[FAILED]} failed")
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
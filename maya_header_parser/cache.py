@@ -0,0 +1,130 @@
+"""
+Opt in process wide cache of parsed headers, for applications that read the same scenes over and over.
+Entries are read only HeaderRecord objects that can be shared between threads. An entry is only used while the file
+identity (device, inode, mtime and size) is the same, and it's dropped when this library saves the file.
+
+Example:
+    cache.enable(max_entries=10000, max_bytes=256 * 1024 ** 2)
+    header_record = cache.read_header_record("C:/filepath/filename.mb")    # Parsed
+    header_record = cache.read_header_record("C:/filepath/filename.mb")    # From the cache, only a stat
+    print(cache.get_cache().stats())
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+from maya_header_parser import record, file_utils
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "evictions", "invalidations", "entries", "bytes"])
+
+_cache = None
+
+
+def estimate_record_size(header_record: record.HeaderRecord) -> int:
+    """ Approximate bytes used by a record, interned strings are counted as well even though they are shared """
+    size = sys.getsizeof(header_record) + sys.getsizeof(header_record.path)
+    for name in ("units", "plugin_names", "plugin_versions", "fileinfo_names", "fileinfo_values"):
+        values = getattr(header_record, name)
+        size += sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+    return size
+
+
+class HeaderCache:
+    """ Thread safe LRU cache of HeaderRecord by path, bounded by entry count and approximate bytes """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {path: (identity, record, size)}, least recently used first
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, path) -> record.HeaderRecord:
+        """ Get the header of a file, it's only parsed if it isn't cached or the file changed """
+        path = os.path.abspath(path)
+        identity = file_utils.get_file_identity(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(path)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+
+        # Parse outside of the lock so other threads aren't blocked by the file read
+        header_record = record.read_header_record(path)
+        self._put(path, identity, header_record)
+        return header_record
+
+    def _put(self, path, identity, header_record):
+        size = estimate_record_size(header_record)
+        with self._lock:
+            self._remove(path)
+            self._entries[path] = (identity, header_record, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, path) -> bool:
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[2]
+        return True
+
+    def invalidate(self, path):
+        """ Drop the entry of a file """
+        with self._lock:
+            if self._remove(os.path.abspath(path)):
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, evictions=self._evictions,
+                              invalidations=self._invalidations, entries=len(self._entries), bytes=self._bytes)
+
+
+def enable(max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES) -> HeaderCache:
+    """ Turn on the process wide cache, returns it """
+    global _cache
+    _cache = HeaderCache(max_entries=max_entries, max_bytes=max_bytes)
+    return _cache
+
+
+def disable():
+    global _cache
+    _cache = None
+
+
+def get_cache() -> HeaderCache:
+    """ Get the process wide cache, None when it's disabled """
+    return _cache
+
+
+def invalidate(path):
+    """ Drop a file from the process wide cache, called by the parsers when they save a file """
+    cache = _cache
+    if cache is not None and path is not None:
+        cache.invalidate(path)
+
+
+def read_header_record(path) -> record.HeaderRecord:
+    """ Get the header of a file from the process wide cache, or parse it if the cache is disabled """
+    cache = _cache
+    if cache is None:
+        return record.read_header_record(path)
+    return cache.get(path)
@@ -0,0 +1,160 @@
+"""
+Compare the headers of two scene versions and merge concurrent header edits.
+The raw header bytes are compared first, when they are identical the headers aren't decoded at all.
+
+Example:
+    for change in diff_headers("C:/scenes/shot_v001.mb", "C:/scenes/shot_v002.mb"):
+        print(change.section, change.name, change.old, "->", change.new)
+
+    result = merge_headers("C:/scenes/base.ma", "C:/scenes/ours.ma", "C:/scenes/theirs.ma")
+    if not result.conflicts:
+        result.maya_file.save()
+"""
+from collections import namedtuple
+
+from maya_header_parser import parser, parser_interface
+
+FILEINFO = "fileinfo"
+PLUGINS = "plugins"
+VERSION = "version"
+UNITS = "units"
+REFERENCES = "references"
+
+# old/new are None when the value was added/removed
+HeaderChange = namedtuple("HeaderChange", ["section", "name", "old", "new"])
+HeaderConflict = namedtuple("HeaderConflict", ["section", "name", "base", "ours", "theirs"])
+MergeResult = namedtuple("MergeResult", ["maya_file", "applied", "conflicts"])
+
+# Sections the parsers can write, changes to the other sections can't be merged
+EDITABLE_SECTIONS = (FILEINFO, PLUGINS, VERSION)
+
+
+def _get_parser(source) -> parser_interface.ParserInterface:
+    if isinstance(source, parser_interface.ParserInterface):
+        return source
+
+    return parser.open_maya_file(source)
+
+
+def _diff_dicts(section, old: dict, new: dict) -> list:
+    changes = []
+    for name, old_value in old.items():
+        new_value = new.get(name)
+        if new_value != old_value:
+            changes.append(HeaderChange(section=section, name=name, old=old_value, new=new_value))
+
+    for name, new_value in new.items():
+        if name not in old:
+            changes.append(HeaderChange(section=section, name=name, old=None, new=new_value))
+
+    return changes
+
+
+def _references_by_key(maya_file) -> dict:
+    return {reference.reference_node or (reference.path, reference.namespace): reference for reference in maya_file.get_references()}
+
+
+def _headers_identical(old_file, new_file) -> bool:
+    """ Whether both headers are unchanged since they were read and have the same bytes """
+    return (
+        type(old_file) is type(new_file)
+        and not old_file.is_modified()
+        and not new_file.is_modified()
+        and old_file.get_header_bytes() == new_file.get_header_bytes()
+    )
+
+
+def diff_headers(old, new, references=True) -> list:
+    """
+    Get the header changes between two scene versions
+    :param old: Parser, or a path/file object/buffer to read with parser.maya_header_parser
+    :param new: Parser, or a path/file object/buffer to read with parser.maya_header_parser
+    :param references: Compare the referenced files as well, for binary files this reads the chunks after the header
+    :return: List of HeaderChange(section, name, old, new), section is one of FILEINFO, PLUGINS, VERSION, UNITS and
+        REFERENCES. Fileinfo values are compared as stored in the file (escaped)
+    """
+    old_file = _get_parser(old)
+    new_file = _get_parser(new)
+
+    changes = []
+    identical = _headers_identical(old_file, new_file)
+    if not identical:
+        old_version = old_file.get_maya_version()
+        new_version = new_file.get_maya_version()
+        if old_version != new_version:
+            changes.append(HeaderChange(section=VERSION, name=None, old=old_version, new=new_version))
+
+        changes += _diff_dicts(UNITS, old_file.get_units(), new_file.get_units())
+        changes += _diff_dicts(PLUGINS, old_file.get_all_plugins(), new_file.get_all_plugins())
+        changes += _diff_dicts(FILEINFO, old_file.get_all_fileinfo(), new_file.get_all_fileinfo())
+
+    # Binary files keep the references outside of the header bytes, so identical headers don't tell us anything there
+    if references and not (identical and old_file.HEADER_HAS_REFERENCES):
+        changes += _diff_dicts(REFERENCES, _references_by_key(old_file), _references_by_key(new_file))
+
+    return changes
+
+
+def apply_changes(maya_file, changes) -> list:
+    """
+    Apply header changes to a parser, make sure to save it afterwards
+    :return: The changes that can't be applied, only fileinfo, plugins and version can be written
+    """
+    not_applied = []
+    for change in changes:
+        if change.section == FILEINFO:
+            if change.new is None:
+                maya_file.remove_fileinfo(change.name)
+            else:
+                maya_file.set_fileinfo(change.name, change.new, string_safe=False)
+        elif change.section == PLUGINS:
+            if change.new is None:
+                maya_file.remove_plugin(change.name)
+            else:
+                maya_file.set_plugin(change.name, change.new)
+        elif change.section == VERSION and change.new is not None:
+            maya_file.set_maya_version(change.new)
+        else:
+            not_applied.append(change)
+
+    return not_applied
+
+
+def merge_headers(base, ours, theirs, prefer: str = None) -> MergeResult:
+    """
+    Three way merge of header edits, the changes made in theirs are applied to ours.
+    Ours is edited but not saved, the caller decides what to do with conflicts before saving.
+    :param base: Common version both edits started from
+    :param ours: Version that gets the changes, a parser is edited directly
+    :param theirs: Version with the changes to merge in
+    :param prefer: How to resolve conflicting edits of the same value, None keeps ours and reports the conflict,
+        "ours" keeps ours, "theirs" uses the value from theirs
+    :return: MergeResult(maya_file, applied, conflicts), maya_file is the edited parser of ours
+    """
+    if prefer not in (None, "ours", "theirs"):
+        raise ValueError(f"Unknown prefer value {prefer}, use None, 'ours' or 'theirs'")
+
+    base_file = _get_parser(base)
+    ours_file = _get_parser(ours)
+    theirs_file = _get_parser(theirs)
+
+    our_changes = {(change.section, change.name): change for change in diff_headers(base_file, ours_file)}
+
+    applied = []
+    conflicts = []
+    for change in diff_headers(base_file, theirs_file):
+        our_change = our_changes.get((change.section, change.name))
+        if our_change is not None and our_change.new == change.new:
+            continue
+
+        conflict = HeaderConflict(section=change.section, name=change.name, base=change.old,
+                                  ours=our_change.new if our_change else change.old, theirs=change.new)
+        if change.section not in EDITABLE_SECTIONS:
+            conflicts.append(conflict)
+        elif our_change is None or prefer == "theirs":
+            apply_changes(ours_file, [change])
+            applied.append(change)
+        elif prefer is None:
+            conflicts.append(conflict)
+
+    return MergeResult(maya_file=ours_file, applied=applied, conflicts=conflicts)
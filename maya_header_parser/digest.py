@@ -0,0 +1,105 @@
+"""
+Fingerprint of the scene content that ignores the header, so fileinfo stamps and plugin edits don't change it.
+For binary files everything after the HEAD chunk is hashed, for ascii files everything after the header lines.
+
+Example:
+    print(body_digest("C:/filepath/filename.mb").hexdigest)
+
+    store_body_digest("C:/filepath/filename.mb")                    # Hash once and keep the digest in the header
+    print(get_stored_body_digest("C:/filepath/filename.mb"))        # Later lookups don't read the scene content
+"""
+import os
+import hashlib
+from collections import namedtuple
+
+try:
+    import xxhash
+except ImportError:
+    # Optional, only needed for the xxh* algorithms
+    xxhash = None
+
+from maya_header_parser import parser, peek, file_utils
+
+DEFAULT_ALGORITHM = "blake2b"
+
+# Bytes read per block while hashing
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Fileinfo the digest is stored in, as "algorithm:body size:hex digest"
+DIGEST_FILEINFO = "mhpBodyDigest"
+
+XXHASH_ALGORITHMS = ("xxh32", "xxh64", "xxh3_64", "xxh3_128", "xxh128")
+
+BodyDigest = namedtuple("BodyDigest", ["algorithm", "body_size", "hexdigest"])
+
+
+def get_hasher(algorithm: str):
+    """ Get a new hasher for any hashlib algorithm (blake2b, blake2s, sha256...) or xxhash algorithm (xxh64, xxh3_128...) """
+    if algorithm in XXHASH_ALGORITHMS:
+        if xxhash is None:
+            raise ValueError(f"The xxhash package is needed for {algorithm}, install it with python -m pip install xxhash")
+        return getattr(xxhash, algorithm)()
+
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unknown hash algorithm {algorithm}")
+    return hashlib.new(algorithm)
+
+
+def _hash_body(maya_file, algorithm) -> BodyDigest:
+    hasher = get_hasher(algorithm)
+    with file_utils.open_binary(maya_file.source) as file_obj:
+        body_size = file_utils.hash_file_data(file_obj, hasher, maya_file.get_body_offset(), HASH_BLOCK_SIZE)
+    return BodyDigest(algorithm=algorithm, body_size=body_size, hexdigest=hasher.hexdigest())
+
+
+def body_digest(source, algorithm=DEFAULT_ALGORITHM) -> BodyDigest:
+    """
+    Hash the scene content after the header, the content is streamed so memory use doesn't depend on file size
+    :param source: File path, binary file object, bytes like object or mmap, see parser.maya_header_parser
+    :param algorithm: See get_hasher
+    :return: BodyDigest(algorithm, body_size, hexdigest)
+    """
+    return _hash_body(parser.open_maya_file(source), algorithm)
+
+
+def format_body_digest(digest: BodyDigest) -> str:
+    return f"{digest.algorithm}:{digest.body_size}:{digest.hexdigest}"
+
+
+def parse_body_digest(value: str) -> BodyDigest:
+    """ Get a BodyDigest from a stored value, None if the value isn't a valid digest """
+    try:
+        algorithm, body_size, hexdigest = value.split(":")
+        return BodyDigest(algorithm=algorithm, body_size=int(body_size), hexdigest=hexdigest)
+    except (AttributeError, ValueError):
+        return None
+
+
+def store_body_digest(path, algorithm=DEFAULT_ALGORITHM, in_place=True) -> BodyDigest:
+    """
+    Hash the scene content and store the digest as fileinfo, the stored digest doesn't change the digest of the body.
+    Nothing is written if the stored digest is already the same
+    :param path: Maya file
+    :param algorithm: See get_hasher
+    :param in_place: Only overwrite the header when the new header fits, see ParserInterface.save
+    """
+    maya_file = parser.open_maya_file(path)
+    digest = _hash_body(maya_file, algorithm)
+    maya_file.set_fileinfo(DIGEST_FILEINFO, format_body_digest(digest))
+    maya_file.save(in_place=in_place)
+    return digest
+
+
+def get_stored_body_digest(path, check_size=True) -> BodyDigest:
+    """
+    Get the digest stored by store_body_digest without hashing the scene content.
+    Maya keeps fileinfo when a scene is saved again, so a stored digest can be out of date. With check_size
+    the digest is only returned if the body still has the same size, which catches most content changes
+    :return: BodyDigest or None if there is no digest or it is out of date
+    """
+    digest = parse_body_digest(peek.peek_fileinfo(path, DIGEST_FILEINFO))
+    if digest is None or not check_size:
+        return digest
+
+    body_size = os.path.getsize(path) - parser.open_maya_file(path).get_body_offset()
+    return digest if body_size == digest.body_size else None
@@ -0,0 +1,223 @@
+"""
+Columnar export of batch header scans, for analytics over many files (plugin adoption, version spread, fileinfo stamps).
+Results are grouped into column batches and streamed to disk, so memory use only depends on the batch size.
+Three tables are written:
+    files:    path, version, linear_unit, angle_unit, time_unit, error
+    plugins:  path, plugin, version      (one row per required plugin)
+    fileinfo: path, key, value           (one row per fileinfo)
+
+With pyarrow every table is one Parquet file with a row group per batch. Without pyarrow every batch of a table is
+written as a NumPy structured array (table-00000.npy, table-00001.npy...), missing versions are -1 and missing strings "".
+
+Example:
+    stats = export_headers(["C:/project/scenes"], "C:/analytics/scenes", workers=16)
+
+    import pandas
+    plugins = pandas.read_parquet("C:/analytics/scenes/plugins.parquet")
+    print(plugins.groupby("plugin").path.count())
+"""
+import os
+from collections import namedtuple
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # Optional, only needed for the parquet format
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:
+    # Optional, only needed for the numpy format
+    numpy = None
+
+from maya_header_parser import scan
+
+# Files per batch, a batch is one Parquet row group or one .npy file per table
+DEFAULT_BATCH_SIZE = 65536
+
+FILES = "files"
+PLUGINS = "plugins"
+FILEINFO = "fileinfo"
+
+TABLE_COLUMNS = {
+    FILES: ("path", "version", "linear_unit", "angle_unit", "time_unit", "error"),
+    PLUGINS: ("path", "plugin", "version"),
+    FILEINFO: ("path", "key", "value"),
+}
+
+# Every other column is a string
+INTEGER_COLUMNS = {(FILES, "version")}
+
+FORMATS = ("parquet", "numpy")
+
+# Every table is a {column: list of values}
+HeaderBatch = namedtuple("HeaderBatch", [FILES, PLUGINS, FILEINFO])
+ExportStats = namedtuple("ExportStats", ["files", "plugins", "fileinfo", "failed"])
+
+
+def _new_batch() -> HeaderBatch:
+    return HeaderBatch(*({column: [] for column in TABLE_COLUMNS[table]} for table in HeaderBatch._fields))
+
+
+def iter_column_batches(results, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Group scan results into column batches, plugins and fileinfo are exploded into one row per value
+    :param results: Iterable of scan.ScanResult, see scan.scan_headers
+    :param batch_size: Files per batch
+    :return: Iterator of HeaderBatch(files, plugins, fileinfo)
+    """
+    batch = _new_batch()
+    files = batch.files
+    for result in results:
+        units = result.units or {}
+        files["path"].append(result.path)
+        files["version"].append(result.version)
+        files["linear_unit"].append(units.get("linear"))
+        files["angle_unit"].append(units.get("angle"))
+        files["time_unit"].append(units.get("time"))
+        files["error"].append(None if result.error is None else str(result.error))
+
+        for table, values in ((PLUGINS, result.plugins), (FILEINFO, result.fileinfo)):
+            if not values:
+                continue
+            path_column, name_column, value_column = getattr(batch, table).values()
+            path_column.extend([result.path] * len(values))
+            name_column.extend(values.keys())
+            value_column.extend(values.values())
+
+        if len(files["path"]) >= batch_size:
+            yield batch
+            batch = _new_batch()
+            files = batch.files
+
+    if files["path"]:
+        yield batch
+
+
+class ParquetWriter:
+    """ Write column batches to one Parquet file per table, each batch is a row group """
+
+    def __init__(self, directory):
+        if pyarrow is None:
+            raise ValueError("The pyarrow package is needed for the parquet format, install it with python -m pip install pyarrow")
+
+        string = pyarrow.string()
+        self.schemas = {
+            FILES: pyarrow.schema([("path", string), ("version", pyarrow.int32()), ("linear_unit", string),
+                                   ("angle_unit", string), ("time_unit", string), ("error", string)]),
+            PLUGINS: pyarrow.schema([("path", string), ("plugin", string), ("version", string)]),
+            FILEINFO: pyarrow.schema([("path", string), ("key", string), ("value", string)]),
+        }
+        self._writers = {}
+        try:
+            for table, schema in self.schemas.items():
+                self._writers[table] = pyarrow.parquet.ParquetWriter(os.path.join(directory, f"{table}.parquet"), schema)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, batch: HeaderBatch):
+        for table, writer in self._writers.items():
+            columns = getattr(batch, table)
+            if columns["path"]:
+                writer.write_table(pyarrow.Table.from_pydict(columns, schema=self.schemas[table]))
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+class NumpyWriter:
+    """ Write every batch of a table as a NumPy structured array, strings are sized to the longest value in the batch """
+
+    def __init__(self, directory):
+        if numpy is None:
+            raise ValueError("The numpy package is needed for the numpy format, install it with python -m pip install numpy")
+
+        self.directory = directory
+        self._batch_index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _to_array(self, table: str, columns: dict):
+        dtype = []
+        values = []
+        for column, column_values in columns.items():
+            if (table, column) in INTEGER_COLUMNS:
+                dtype.append((column, "i4"))
+                values.append([-1 if value is None else value for value in column_values])
+            else:
+                column_values = ["" if value is None else value for value in column_values]
+                dtype.append((column, f"U{max(map(len, column_values), default=1) or 1}"))
+                values.append(column_values)
+
+        return numpy.rec.fromarrays(values, dtype=dtype).view(numpy.ndarray)
+
+    def write(self, batch: HeaderBatch):
+        for table in HeaderBatch._fields:
+            columns = getattr(batch, table)
+            filename = os.path.join(self.directory, f"{table}-{self._batch_index:05d}.npy")
+            numpy.save(filename, self._to_array(table, columns), allow_pickle=False)
+        self._batch_index += 1
+
+    def close(self):
+        pass
+
+
+def get_default_format() -> str:
+    """ Parquet if pyarrow is installed, otherwise numpy """
+    return "parquet" if pyarrow is not None or numpy is None else "numpy"
+
+
+def write_results(results, directory, format: str = None, batch_size: int = DEFAULT_BATCH_SIZE) -> ExportStats:
+    """
+    Write scan results as column tables
+    :param results: Iterable of scan.ScanResult, see scan.scan_headers
+    :param directory: Directory the tables are written to, created if it doesn't exist
+    :param format: "parquet" or "numpy", see get_default_format
+    :param batch_size: Files per batch, bounds the memory used
+    :return: ExportStats(files, plugins, fileinfo, failed) with the number of rows written
+    """
+    format = format or get_default_format()
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format}, use one of {list(FORMATS)}")
+
+    os.makedirs(directory, exist_ok=True)
+    files = plugins = fileinfo = failed = 0
+    with (ParquetWriter if format == "parquet" else NumpyWriter)(directory) as writer:
+        for batch in iter_column_batches(results, batch_size=batch_size):
+            writer.write(batch)
+            files += len(batch.files["path"])
+            plugins += len(batch.plugins["path"])
+            fileinfo += len(batch.fileinfo["path"])
+            failed += sum(error is not None for error in batch.files["error"])
+
+    return ExportStats(files=files, plugins=plugins, fileinfo=fileinfo, failed=failed)
+
+
+def export_headers(paths_or_roots, directory, format: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                   workers: int = None, executor="thread") -> ExportStats:
+    """
+    Scan the headers of many files and write them as column tables, see scan.scan_headers and write_results
+    :param paths_or_roots: File/directory path or a list of paths, see scan.iter_maya_files
+    :param directory: Directory the tables are written to
+    :param format: "parquet" or "numpy", defaults to parquet when pyarrow is installed
+    :param batch_size: Files per batch
+    :param workers: Number of worker threads/processes
+    :param executor: "thread" or "process"
+    """
+    results = scan.scan_headers(paths_or_roots, workers=workers, executor=executor)
+    return write_results(results, directory, format=format, batch_size=batch_size)
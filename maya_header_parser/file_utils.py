@@ -0,0 +1,348 @@
+import io
+import os
+import errno
+import mmap
+import shutil
+import logging
+import tempfile
+import contextlib
+from collections import namedtuple
+
+from maya_header_parser import metrics
+
+log = logging.getLogger("maya_header_parser")
+
+# Size of the blocks used when the kernel can't copy the data for us
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Size of the blocks compared when looking for changed data, changed blocks next to each other are written together
+COMPARE_BLOCK_SIZE = 512
+
+# What is used to tell if a file changed since it was read, see get_file_identity
+FileIdentity = namedtuple("FileIdentity", ["device", "inode", "mtime_ns", "size"])
+
+
+@metrics.timed("copy_data")
+def copy_file_data(src_obj, dst_obj, offset: int, length: int = None) -> int:
+    """
+    Copy data from one file to the end of another in fixed size blocks, so memory use stays the same for any file size.
+    Uses os.copy_file_range/os.sendfile when the platform supports it, so the data never has to pass through python.
+    :param src_obj: Binary file object to copy from
+    :param dst_obj: Binary file object to copy to, data is written at the current position
+    :param offset: Offset in the source file to start copying from
+    :param length: Number of bytes to copy, copies to the end of the source file if None
+    :return: Number of bytes copied
+    """
+    try:
+        src_fd = src_obj.fileno()
+    except (OSError, AttributeError):
+        # Archive members, in memory buffers etc. don't have a file descriptor to hand to the kernel
+        return _copy_file_obj(src_obj, dst_obj, offset, length)
+
+    if length is None:
+        length = os.fstat(src_fd).st_size - offset
+
+    dst_obj.flush()
+    dst_fd = dst_obj.fileno()
+    # The kernel functions write at the position of the fd, not at the position of the (buffered) file object
+    os.lseek(dst_fd, dst_obj.tell(), os.SEEK_SET)
+
+    copied = 0
+    copy_funcs = [_copy_file_range, _sendfile, _read_write]
+    while copied < length:
+        copy_func = copy_funcs[0]
+        try:
+            block_size = copy_func(src_fd, dst_fd, offset + copied, min(COPY_BLOCK_SIZE, length - copied))
+        except (OSError, AttributeError) as error:
+            # Not supported for this platform/file system, only fall back before anything was copied
+            if copied or len(copy_funcs) == 1:
+                raise
+            log.debug(f"{copy_func.__name__} failed, falling back to the next copy method: {error}")
+            copy_funcs.pop(0)
+            continue
+
+        if not block_size:
+            # copy_file_range/sendfile copy nothing on some file systems instead of failing
+            if copied or len(copy_funcs) == 1:
+                break
+            log.debug(f"{copy_func.__name__} copied nothing, falling back to the next copy method")
+            copy_funcs.pop(0)
+            continue
+
+        copied += block_size
+        metrics.add("copy_syscalls")
+
+    if copied != length:
+        # Never let a caller replace a file with a truncated copy
+        raise OSError(errno.EIO, f"Only copied {copied} of {length} bytes, the source file ended early")
+
+    dst_obj.seek(os.lseek(dst_fd, 0, os.SEEK_CUR))
+    metrics.add("bytes_copied", copied)
+    return copied
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _read_write(src_fd, dst_fd, offset, count):
+    data = os.pread(src_fd, count, offset) if hasattr(os, "pread") else _seek_read(src_fd, offset, count)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(dst_fd, view):]
+    return len(data)
+
+
+def _seek_read(fd, offset, count):
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, count)
+
+
+def _copy_file_obj(src_obj, dst_obj, offset, length=None) -> int:
+    """
+    Copy between file objects in blocks of COPY_BLOCK_SIZE, used when the source has no file descriptor.
+    With offset None the source is read from its current position
+    """
+    if offset is not None:
+        src_obj.seek(offset)
+    copied = 0
+    while length is None or copied < length:
+        data = src_obj.read(COPY_BLOCK_SIZE if length is None else min(COPY_BLOCK_SIZE, length - copied))
+        if not data:
+            break
+        dst_obj.write(data)
+        copied += len(data)
+    return copied
+
+
+def copy_stream_data(src_obj, dst_obj) -> int:
+    """ Copy everything from the current position of a stream that can't seek (pipe, socket) to another file """
+    copied = _copy_file_obj(src_obj, dst_obj, None)
+    metrics.add("bytes_copied", copied)
+    return copied
+
+
+def get_file_identity(path) -> FileIdentity:
+    """ Get the device, inode, mtime and size of a file, a file that was replaced or written to gets another identity """
+    stat = os.stat(path)
+    return FileIdentity(device=stat.st_dev, inode=stat.st_ino, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+
+def is_path(source) -> bool:
+    """ Whether a parser source is a file path, as opposed to a file object or buffer """
+    return isinstance(source, (str, os.PathLike))
+
+
+def is_buffer(source) -> bool:
+    """ Whether a parser source is in memory data (bytes, bytearray, memoryview or mmap) """
+    return isinstance(source, (bytes, bytearray, memoryview, mmap.mmap))
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read only raw file object over a bytes like object or mmap, the data is not copied.
+    Wrap it in io.BufferedReader to get line iteration, see open_binary.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+
+        self._position = offset
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self):
+        # Release the view so an mmap can be closed once the parser is done with it
+        self._view.release()
+        super().close()
+
+
+class PrefixedReader(io.RawIOBase):
+    """
+    Read only raw file object that returns data that was already read from a stream before the rest of the stream.
+    Used to look at the start of a stream that can't seek without consuming it. The stream is not closed.
+    """
+
+    def __init__(self, prefix: bytes, file_obj):
+        super().__init__()
+        self._prefix = prefix
+        self._file_obj = file_obj
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            data = self._prefix[:len(buffer)]
+            self._prefix = self._prefix[len(data):]
+        else:
+            data = self._file_obj.read(len(buffer)) or b""
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def read_at_least(file_obj, size: int) -> bytes:
+    """ Read size bytes from a stream, reads of pipes and sockets can return less so this reads until it has them or the stream ended """
+    data = b""
+    while len(data) < size:
+        chunk = file_obj.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def hash_file_data(file_obj, hasher, offset: int, block_size: int = COPY_BLOCK_SIZE) -> int:
+    """
+    Feed everything from offset to the end of the file to a hashlib style hasher, reading into one reused buffer
+    :return: Number of bytes hashed
+    """
+    file_obj.seek(offset)
+    buffer = bytearray(block_size)
+    hashed = 0
+    with memoryview(buffer) as view:
+        while True:
+            size = file_obj.readinto(view)
+            if not size:
+                break
+            hasher.update(view[:size])
+            hashed += size
+    return hashed
+
+
+def get_changed_ranges(old_data, new_data) -> list:
+    """
+    Get the byte ranges that differ between two buffers, compared in blocks of COMPARE_BLOCK_SIZE
+    :return: List of (start, end), the whole new data if the sizes differ or there is no old data
+    """
+    if old_data is None or len(old_data) != len(new_data):
+        return [(0, len(new_data))] if len(new_data) else []
+
+    ranges = []
+    with memoryview(old_data) as old_view, memoryview(new_data) as new_view:
+        for start in range(0, len(new_data), COMPARE_BLOCK_SIZE):
+            end = min(start + COMPARE_BLOCK_SIZE, len(new_data))
+            if old_view[start:end] == new_view[start:end]:
+                continue
+
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+
+    return ranges
+
+
+def write_changed_ranges(file_obj, offset: int, old_data, new_data) -> int:
+    """
+    Overwrite only the parts of new_data that differ from old_data, old_data is what's in the file at offset
+    :return: Number of bytes written
+    """
+    written = 0
+    with memoryview(new_data) as new_view:
+        for start, end in get_changed_ranges(old_data, new_data):
+            file_obj.seek(offset + start)
+            written += file_obj.write(new_view[start:end])
+
+    return written
+
+
+@contextlib.contextmanager
+def open_binary(source, file_obj=None):
+    """
+    Get a binary file object to read a parser source from the start
+    :param source: File path, binary file object, bytes like object or mmap
+    :param file_obj: Already open file object of source to reuse instead
+    A file object that's passed in is left open, seeking back to the start is free if the data is still in its read buffer.
+    Streams that can't seek (pipes, sockets) are read from their current position.
+    """
+    if file_obj is None and is_path(source):
+        with metrics.open_file(source, "rb") as file_obj:
+            yield file_obj
+        return
+
+    if file_obj is None and is_buffer(source):
+        with io.BufferedReader(BufferReader(source)) as file_obj:
+            yield file_obj
+        return
+
+    file_obj = file_obj if file_obj is not None else source
+    if file_obj.seekable():
+        file_obj.seek(0)
+    yield file_obj
+
+
+@contextlib.contextmanager
+def map_file(file_obj):
+    """
+    Map a file object read only, the mapping is closed when the with block ends.
+    Yields None when the file can't be mapped (pipes, archive members, in memory buffers, empty files)
+    """
+    try:
+        if not file_obj.seekable():
+            raise io.UnsupportedOperation("Stream can't be mapped")
+        mapped = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        yield None
+        return
+
+    with mapped:
+        yield mapped
+
+
+@contextlib.contextmanager
+def atomic_write(filename, mode_filename=None):
+    """
+    Open a temporary binary file next to filename, that replaces filename once the with block finishes without errors.
+    If anything goes wrong the temporary file is removed and filename is left untouched.
+    :param filename: File to write
+    :param mode_filename: Copy file permissions from this file if filename doesn't exist yet
+    A symlink is written through, the file it points to is replaced and the link is kept.
+    """
+    filename = os.path.realpath(filename)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_filename = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=directory)
+    try:
+        with metrics.open_file(fd, "wb") as file_obj:
+            yield file_obj
+            file_obj.flush()
+            os.fsync(file_obj.fileno())
+
+        for permission_filename in (filename, mode_filename):
+            if permission_filename and os.path.exists(permission_filename):
+                shutil.copymode(permission_filename, temp_filename)
+                break
+
+        os.replace(temp_filename, filename)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_filename)
+        raise
@@ -0,0 +1,297 @@
+import os
+import sqlite3
+import logging
+from collections import namedtuple
+
+from maya_header_parser import parser, scan, references, file_utils
+
+log = logging.getLogger("maya_header_parser")
+
+IndexEntry = namedtuple("IndexEntry", ["path", "version", "fileinfo", "plugins", "units", "file_references", "error"])
+# Resolved path of a referenced file, see references.resolve_references. Depth 1 is referenced by the file itself,
+# higher depths are nested references of those
+IndexReference = namedtuple("IndexReference", ["path", "depth"])
+RefreshStats = namedtuple("RefreshStats", ["parsed", "unchanged", "removed", "failed"])
+
+# Number of parsed files stored per transaction while refreshing
+COMMIT_INTERVAL = 1000
+
+# Stored in the database user_version, an index written with another version is dropped and built again
+SCHEMA_VERSION = 3
+
+DROP_SCHEMA = """
+DROP TABLE IF EXISTS file_references;
+DROP TABLE IF EXISTS plugins;
+DROP TABLE IF EXISTS fileinfo;
+DROP TABLE IF EXISTS files;
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    maya_version INTEGER,
+    linear_unit TEXT,
+    angle_unit TEXT,
+    time_unit TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS fileinfo (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plugins (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_references (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    reference TEXT NOT NULL,
+    depth INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_maya_version ON files(maya_version);
+CREATE INDEX IF NOT EXISTS fileinfo_path ON fileinfo(path);
+CREATE INDEX IF NOT EXISTS fileinfo_key_value ON fileinfo(key, value);
+CREATE INDEX IF NOT EXISTS plugins_path ON plugins(path);
+CREATE INDEX IF NOT EXISTS plugins_name_version ON plugins(name, version);
+CREATE INDEX IF NOT EXISTS file_references_path ON file_references(path);
+CREATE INDEX IF NOT EXISTS file_references_reference ON file_references(reference);
+"""
+
+
+def read_index_entry(path) -> tuple:
+    """ Read everything the index stores for one file, returns (identity, entry). Errors are returned in the entry """
+    identity = file_utils.FileIdentity(device=0, inode=0, mtime_ns=0, size=0)
+    try:
+        identity = file_utils.get_file_identity(path)
+        maya_file = parser.open_maya_file(path)
+
+        entry = IndexEntry(
+            path=path,
+            version=maya_file.get_maya_version(),
+            fileinfo=maya_file.get_all_fileinfo(),
+            plugins=maya_file.get_all_plugins(),
+            units=maya_file.get_units(),
+            file_references=[
+                IndexReference(path=referenced_path, depth=depth)
+                for _, referenced_path, depth in references.resolve_references(os.path.abspath(path), maya_file.get_references())
+            ],
+            error=None,
+        )
+    except Exception as error:
+        log.debug(f"Failed to index {path}: {error}")
+        entry = IndexEntry(path=path, version=None, fileinfo={}, plugins={}, units={}, file_references=[], error=repr(error))
+
+    return identity, entry
+
+
+class HeaderIndex:
+    """
+    Persistent SQLite index of maya file headers.
+    Refreshing the index only parses files whose identity (device, inode, mtime, size) changed since the last refresh.
+
+    Example:
+        header_index = HeaderIndex("C:/project/header_index.db")
+        header_index.refresh(["C:/project/scenes"], workers=16)
+
+        print(header_index.files_requiring_plugin("mtoa", version_prefix="5."))
+        print(header_index.files_with_fileinfo("Embark_info", "X"))
+    """
+
+    def __init__(self, database: str):
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.connection.executescript(DROP_SCHEMA)
+        self.connection.executescript(SCHEMA + f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_identities(self) -> dict:
+        rows = self.connection.execute("SELECT path, device, inode, mtime_ns, size FROM files")
+        return {path: file_utils.FileIdentity(*identity) for path, *identity in rows}
+
+    def _get_identity(self, path) -> file_utils.FileIdentity:
+        row = self.connection.execute("SELECT device, inode, mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+        return file_utils.FileIdentity(*row) if row else None
+
+    def is_current(self, path) -> bool:
+        """ Whether a file is indexed and hasn't changed since, only looks up that one file """
+        try:
+            return self._get_identity(path) == file_utils.get_file_identity(path)
+        except OSError:
+            return False
+
+    def update_files(self, entries=(), removed=()) -> RefreshStats:
+        """
+        Store files that were already read and remove deleted files, without looking at the rest of the index.
+        Used to apply the changes reported by a file watcher, see watch.HeaderWatcher
+        :param entries: Iterable of (identity, entry) as returned by read_index_entry
+        :param removed: Paths of files that no longer exist
+        :return: RefreshStats(parsed, unchanged, removed, failed), parsed is the number of entries stored
+        """
+        parsed = unchanged = removed_count = failed = 0
+        with self.connection:
+            for identity, entry in entries:
+                if self._get_identity(entry.path) == identity:
+                    unchanged += 1
+                    continue
+
+                self._store_entry(identity, entry)
+                parsed += 1
+                failed += entry.error is not None
+
+            for path in removed:
+                removed_count += self.connection.execute("DELETE FROM files WHERE path = ?", (path,)).rowcount
+
+        return RefreshStats(parsed=parsed, unchanged=unchanged, removed=removed_count, failed=failed)
+
+    def _store_entry(self, identity: file_utils.FileIdentity, entry: IndexEntry):
+        self.connection.execute("DELETE FROM files WHERE path = ?", (entry.path,))
+        self.connection.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry.path, identity.device, identity.inode, identity.mtime_ns, identity.size, entry.version,
+             entry.units.get("linear"), entry.units.get("angle"), entry.units.get("time"), entry.error)
+        )
+        self.connection.executemany("INSERT INTO fileinfo VALUES (?, ?, ?)", [(entry.path, key, value) for key, value in entry.fileinfo.items()])
+        self.connection.executemany("INSERT INTO plugins VALUES (?, ?, ?)", [(entry.path, name, version) for name, version in entry.plugins.items()])
+        self.connection.executemany(
+            "INSERT INTO file_references VALUES (?, ?, ?)",
+            [(entry.path, reference.path, reference.depth) for reference in entry.file_references]
+        )
+
+    def refresh(self, paths_or_roots, workers: int = None, executor="thread", remove_missing=True) -> RefreshStats:
+        """
+        Update the index for the given files/directories, only new or changed files are parsed
+        :param paths_or_roots: File/directory path or a list of paths, see scan.iter_maya_files
+        :param workers: Number of worker threads/processes used to parse changed files
+        :param executor: "thread" or "process"
+        :param remove_missing: Remove indexed files that no longer exist in the given paths
+        :return: RefreshStats(parsed, unchanged, removed, failed)
+        """
+        if isinstance(paths_or_roots, (str, os.PathLike)):
+            paths_or_roots = [paths_or_roots]
+        paths_or_roots = [os.fspath(path) for path in paths_or_roots]
+
+        indexed = self._get_identities()
+        seen = set()
+        unchanged = 0
+
+        def changed_paths():
+            nonlocal unchanged
+            for path in scan.iter_maya_files(paths_or_roots):
+                try:
+                    identity = file_utils.get_file_identity(path)
+                except OSError:
+                    continue
+
+                seen.add(path)
+                if indexed.get(path) == identity:
+                    unchanged += 1
+                else:
+                    yield path
+
+        parsed = failed = 0
+        try:
+            for identity, entry in scan.scan_headers(changed_paths(), workers=workers, executor=executor, read_func=read_index_entry):
+                self._store_entry(identity, entry)
+                parsed += 1
+                failed += entry.error is not None
+                if not parsed % COMMIT_INTERVAL:
+                    self.connection.commit()
+        finally:
+            self.connection.commit()
+
+        removed = 0
+        if remove_missing:
+            roots = tuple(os.path.join(path, "") for path in paths_or_roots if os.path.isdir(path))
+            missing = [
+                path for path in indexed
+                if path not in seen and (path.startswith(roots) or path in paths_or_roots)
+            ]
+            with self.connection:
+                self.connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in missing])
+            removed = len(missing)
+
+        return RefreshStats(parsed=parsed, unchanged=unchanged, removed=removed, failed=failed)
+
+    def get(self, path) -> IndexEntry:
+        """ Get the indexed header of a file, None if the file isn't indexed """
+        row = self.connection.execute(
+            "SELECT maya_version, linear_unit, angle_unit, time_unit, error FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        maya_version, linear_unit, angle_unit, time_unit, error = row
+        units = {name: unit for name, unit in (("linear", linear_unit), ("angle", angle_unit), ("time", time_unit)) if unit}
+        return IndexEntry(
+            path=path,
+            version=maya_version,
+            fileinfo=dict(self.connection.execute("SELECT key, value FROM fileinfo WHERE path = ?", (path,))),
+            plugins=dict(self.connection.execute("SELECT name, version FROM plugins WHERE path = ?", (path,))),
+            units=units,
+            file_references=[
+                IndexReference(*row) for row in self.connection.execute("SELECT reference, depth FROM file_references WHERE path = ?", (path,))
+            ],
+            error=error,
+        )
+
+    def _query_paths(self, query, parameters=()) -> list:
+        return [row[0] for row in self.connection.execute(query, parameters)]
+
+    def files_requiring_plugin(self, name: str, version_prefix: str = None) -> list:
+        """
+        Get all files that require a plugin
+        :param name: Plugin name
+        :param version_prefix: Only include files requiring a plugin version that starts with this, for example "5."
+        """
+        if version_prefix is None:
+            return self._query_paths("SELECT DISTINCT path FROM plugins WHERE name = ? ORDER BY path", (name,))
+
+        return self._query_paths(
+            "SELECT DISTINCT path FROM plugins WHERE name = ? AND substr(version, 1, ?) = ? ORDER BY path",
+            (name, len(version_prefix), version_prefix)
+        )
+
+    def files_with_fileinfo(self, key: str, value: str = None) -> list:
+        """
+        Get all files that have a fileinfo
+        :param key: Fileinfo name
+        :param value: Only include files where the fileinfo has this value, the value is stored as in the file
+        """
+        if value is None:
+            return self._query_paths("SELECT DISTINCT path FROM fileinfo WHERE key = ? ORDER BY path", (key,))
+
+        return self._query_paths("SELECT DISTINCT path FROM fileinfo WHERE key = ? AND value = ? ORDER BY path", (key, value))
+
+    def files_referencing(self, path, include_nested=False) -> list:
+        """
+        Get all files that reference a file, see references.build_reference_graph to follow references across files
+        :param path: Referenced file, matched against the resolved reference paths
+        :param include_nested: Also include files that only load it through one of their references
+        """
+        path = references.resolve_reference_path(os.path.abspath(path), os.path.abspath(path))
+        if include_nested:
+            return self._query_paths("SELECT DISTINCT path FROM file_references WHERE reference = ? ORDER BY path", (path,))
+
+        return self._query_paths("SELECT DISTINCT path FROM file_references WHERE reference = ? AND depth = 1 ORDER BY path", (path,))
+
+    def files_with_maya_version(self, version: int) -> list:
+        return self._query_paths("SELECT path FROM files WHERE maya_version = ? ORDER BY path", (version,))
+
+    def files_with_errors(self) -> list:
+        return self._query_paths("SELECT path FROM files WHERE error IS NOT NULL ORDER BY path")
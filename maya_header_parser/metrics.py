@@ -0,0 +1,163 @@
+"""
+Opt in instrumentation of the parse and save paths: time per phase, bytes and syscalls for reads/writes/copies,
+and the number of records/lines parsed. Nothing is measured until enable() is called, and when it's disabled the
+instrumented functions only check a module variable.
+
+Example:
+    collector = metrics.enable()
+    for result in scan.scan_headers(["C:/project/scenes"], workers=16):
+        pass
+    print(collector.to_prometheus())
+    metrics.disable()
+
+Any object with record_time(phase, seconds) and add(name, value) can be used as collector, to forward the numbers
+to an existing metrics system. Only files opened by the parsers are counted, not file objects passed in by the caller.
+With the process executor every worker process has its own collector.
+"""
+import io
+import json
+import time
+import threading
+import functools
+
+_collector = None
+
+
+class MetricsCollector:
+    """ Thread safe in memory collector, with JSON and Prometheus text output """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}  # {phase: [count, total seconds, max seconds]}
+        self.counters = {}  # {name: value}
+
+    def record_time(self, phase: str, seconds: float):
+        with self._lock:
+            timing = self.phases.setdefault(phase, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def add(self, name: str, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.phases.clear()
+            self.counters.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phases": {phase: {"count": count, "seconds": seconds, "max_seconds": max_seconds}
+                           for phase, (count, seconds, max_seconds) in self.phases.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="maya_header_parser") -> str:
+        """ Get the metrics in the Prometheus text exposition format """
+        data = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent per phase",
+            f"# TYPE {prefix}_phase_seconds summary",
+        ]
+        for phase, timing in sorted(data["phases"].items()):
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {timing["seconds"]:.9f}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{phase}"}} {timing["count"]}')
+
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def enable(collector=None):
+    """ Start collecting metrics, returns the collector (a new MetricsCollector if none is given) """
+    global _collector
+    _collector = collector if collector is not None else MetricsCollector()
+    return _collector
+
+
+def disable():
+    global _collector
+    _collector = None
+
+
+def get_collector():
+    """ Get the active collector, None when instrumentation is disabled """
+    return _collector
+
+
+def add(name: str, value=1):
+    """ Add to a counter of the active collector """
+    collector = _collector
+    if collector is not None:
+        collector.add(name, value)
+
+
+def timed(phase: str):
+    """ Decorator that records the run time of a function as phase """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            collector = _collector
+            if collector is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                collector.record_time(phase, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class CountingFileIO(io.FileIO):
+    """ FileIO that counts every read/write/seek syscall and the bytes that went through them """
+
+    def __init__(self, file, mode, collector):
+        super().__init__(file, mode)
+        self._collector = collector
+
+    def readinto(self, buffer):
+        size = super().readinto(buffer)
+        self._collector.add("read_syscalls")
+        self._collector.add("bytes_read", size or 0)
+        return size
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self._collector.add("read_syscalls")
+        self._collector.add("bytes_read", len(data or b""))
+        return data
+
+    def write(self, data):
+        size = super().write(data)
+        self._collector.add("write_syscalls")
+        self._collector.add("bytes_written", size or 0)
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._collector.add("seek_syscalls")
+        return super().seek(offset, whence)
+
+
+def open_file(file, mode="rb"):
+    """ Same as open() for binary modes ("rb", "wb", "r+b"), counts the syscalls when instrumentation is enabled """
+    collector = _collector
+    if collector is None:
+        return open(file, mode)
+
+    collector.add("open_calls")
+    raw = CountingFileIO(file, mode.replace("b", ""), collector)
+    if "+" in mode:
+        return io.BufferedRandom(raw)
+    if "r" in mode:
+        return io.BufferedReader(raw)
+    return io.BufferedWriter(raw)
@@ -1,15 +1,76 @@
+import io
+import logging
 from pprint import pprint
 
-from maya_header_parser import parser_interface
+from maya_header_parser import parser_interface, file_utils, metrics
 
 
-def maya_header_parser(filename, fileinfo_data=None, plugin_data=None) -> parser_interface.ParserInterface:
-    if filename.endswith(".mb"):
-        from maya_header_parser import parser_binary
-        return parser_binary.BinaryHeaderParser(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data)
-    elif filename.endswith(".ma"):
-        from maya_header_parser import parser_ascii
-        return parser_ascii.AsciiHeaderParser(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data)
+# Bytes read from the start of the file to detect the file format
+SNIFF_SIZE = 16
+
+BINARY = "binary"
+ASCII = "ascii"
+
+
+def sniff_format(data: bytes) -> str:
+    """
+    Detect the maya file format from the first bytes of a file
+    :param data: Start of the file, at least SNIFF_SIZE bytes if the file is that large
+    :return: BINARY, ASCII or None if it doesn't look like a maya file
+    """
+    if data[:4] in (b"FOR8", b"FOR4"):
+        return BINARY
+
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    if data.startswith(b"//Maya ASCII"):
+        return ASCII
+
+    return None
+
+
+@metrics.timed("parse")
+def maya_header_parser(filename, fileinfo_data=None, plugin_data=None, header_padding=0) -> parser_interface.ParserInterface:
+    """
+    Get a parser for the given maya file, the format is detected from the file content so the extension doesn't matter.
+    The file is only opened once, the parser reuses the data read to detect the format.
+    :param filename: File path, or a binary file object, bytes like object or mmap to read the maya file from.
+        Examples are archive members (tarfile.extractfile, zipfile.open), pipes or uploaded data
+    :return: Parser for the file or None if it isn't a supported maya file
+    """
+    if not (file_utils.is_path(filename) or file_utils.is_buffer(filename) or filename.seekable()):
+        # The start of a stream that can't seek is needed twice, the parser reads it again after the sniffed bytes.
+        # A read (or peek) of a pipe can return less than asked for, so read until there is enough to detect the format
+        data = file_utils.read_at_least(filename, SNIFF_SIZE)
+        filename = io.BufferedReader(file_utils.PrefixedReader(data, filename))
+
+    with file_utils.open_binary(filename) as file_obj:
+        if file_obj.seekable():
+            data = file_obj.read(SNIFF_SIZE)
+        file_format = sniff_format(data)
+
+        if file_format == BINARY:
+            if data[:4] == b"FOR4":
+                logging.getLogger("maya_header_parser").warning(f"32 bit maya binary files (FOR4) are not supported {filename}")
+                return None
+
+            from maya_header_parser import parser_binary
+            return parser_binary.BinaryHeaderParser(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data, header_padding=header_padding, file_obj=file_obj)
+
+        elif file_format == ASCII:
+            from maya_header_parser import parser_ascii
+            return parser_ascii.AsciiHeaderParser(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data, header_padding=header_padding, file_obj=file_obj)
+
+
+def open_maya_file(filename, fileinfo_data=None, plugin_data=None, header_padding=0) -> parser_interface.ParserInterface:
+    """
+    Get a parser for the given maya file like maya_header_parser, but raise instead of returning None
+    :raises ValueError: If it isn't a supported maya file
+    """
+    maya_file = maya_header_parser(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data, header_padding=header_padding)
+    if maya_file is None:
+        raise ValueError(f"Not a supported maya file {filename}")
+    return maya_file
 
 
 if __name__ == "__main__":
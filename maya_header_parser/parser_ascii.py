@@ -1,8 +1,109 @@
+import io
 import re
+import codecs
+import shlex
 import logging
 from pprint import pprint
 
-from maya_header_parser import parser_interface
+from maya_header_parser import parser_interface, file_utils, metrics, cache
+
+
+def unpack_units_line(line_data: str) -> dict:
+    """ Get all unit settings in a line like 'currentUnit -l centimeter -a degree -t ntsc;' as {"-l": "centimeter", ...} """
+    unit_dict = {}
+    for unit in re.findall("-[a-z]+ [a-z]+", line_data):
+        split_unit = unit.split(" ")
+        unit_dict[split_unit[0]] = " ".join(split_unit[1:])
+    return unit_dict
+
+
+def unpack_requires_line(line_data: str) -> tuple:
+    """ Get (name, version) from a stripped line like 'requires "mtoa" "5.1.0";' """
+    data_split = line_data[len(AsciiHeaderParser.REQUIRES):-1].replace("\"", "").split(" ")
+    variable = data_split[0].strip("\"")
+    value = " ".join(data_split[1:]).strip("\"")
+    return str(variable), value
+
+
+def unpack_fileinfo_line(line_data: str) -> tuple:
+    """ Get (name, value) from a stripped line like 'fileInfo "name" "value";' """
+    data_split = line_data[len(AsciiHeaderParser.FINF):-1].split(" ")
+    variable = data_split[0].strip("\"")
+    value = " ".join(data_split[1:]).strip("\"")
+    return str(variable), value
+
+
+def unpack_file_line(line_data: str) -> parser_interface.FileReference:
+    """ Get a FileReference from a stripped line like 'file -rdi 1 -ns "rig" -rfn "rigRN" -typ "mayaAscii" "/proj/rig.ma";' """
+    command = line_data[len(AsciiHeaderParser.FILE):].rstrip(";")
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        # Unbalanced quotes, fall back to splitting on spaces
+        args = [arg.strip("\"") for arg in command.split()]
+    return parser_interface.unpack_reference_args(args)
+
+
+# Lines that start the scene content, the header is everything before the first one
+HEADER_END_MARKERS = (b"createNode", b"// End of")
+
+# Bytes read per block when the header end is searched in a stream that can't be mapped
+HEADER_READ_SIZE = 64 * 1024
+
+
+def find_header_end(data, start: int = 0) -> int:
+    """
+    Get the byte offset of the first line that starts with one of HEADER_END_MARKERS
+    :param data: bytes, bytearray or mmap, it's only searched up to the first marker
+    :param start: Offset to search from
+    :return: The offset or -1 if there is no marker
+    """
+    end = len(data)
+    header_end = -1
+    for marker in HEADER_END_MARKERS:
+        if start == 0 and data[:len(marker)] == marker:
+            return 0
+
+        # Later markers only have to be searched before the first one that was found
+        position = data.find(b"\n" + marker, start, end)
+        if position >= 0:
+            end = position
+            header_end = position + 1
+
+    return header_end
+
+
+def read_header_bytes(file_obj) -> tuple:
+    """
+    Read everything before the header end from a stream, in blocks
+    :return: (header bytes, bytes after the header end that were read as well)
+    """
+    data = bytearray()
+    overlap = max(len(marker) for marker in HEADER_END_MARKERS)
+    while True:
+        # A marker can be split over two blocks
+        search_start = max(0, len(data) - overlap)
+        block = file_obj.read(HEADER_READ_SIZE)
+        if not block:
+            return bytes(data), b""
+
+        data += block
+        header_end = find_header_end(data, search_start)
+        if header_end >= 0:
+            return bytes(data[:header_end]), bytes(data[header_end:])
+
+
+class _LazySections(dict):
+    """ Header sections that are parsed the first time they are accessed """
+
+    def __init__(self, unpack_section):
+        super().__init__()
+        self._unpack_section = unpack_section
+
+    def __missing__(self, section):
+        value = self._unpack_section(section)
+        self[section] = value
+        return value
 
 
 class AsciiHeaderParser(parser_interface.ParserInterface):
@@ -35,16 +136,32 @@ class AsciiHeaderParser(parser_interface.ParserInterface):
     FINF = "fileInfo "
     UNKNOWN = "unknown"
 
-    def __init__(self, filename, fileinfo_data=None, plugin_data=None):
-        super().__init__(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data)
+    # Sections in the order they are written, plugins are stored as requires lines
+    SECTIONS = (COMMENT, FILE, REQUIRES, PLUG, UNITS, FINF, UNKNOWN)
+    LINE_SECTIONS = (COMMENT, FILE, REQUIRES, UNITS, FINF, UNKNOWN)
+
+    HEADER_HAS_REFERENCES = True
+
+    # Comment line used to fill out unused space at the end of the header
+    PADDING_PREFIX = "//mhpPadding"
+
+    # Padding fileinfo of a .mb file that Maya saved again as .ma, see ParserInterface.PADDING_NAME
+    PADDING_FILEINFO_PREFIX = f'{FINF}"{parser_interface.ParserInterface.PADDING_NAME}"'
+
+    def __init__(self, filename, fileinfo_data=None, plugin_data=None, header_padding=0, file_obj=None):
+        super().__init__(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data, header_padding=header_padding, file_obj=file_obj)
 
         self.log = logging.getLogger("maya_header_parser")
 
-        self.filename = filename
-        self._header_data = {self.COMMENT: [], self.FILE: [], self.REQUIRES: {}, self.PLUG: {}, self.UNITS: {}, self.FINF: {}, self.UNKNOWN:[]}
+        self._header_bytes = b""  # Raw header lines, sections are parsed from this when they are first needed
+        self._section_lines = {section: [] for section in self.LINE_SECTIONS}  # (start, end) of each line in _header_bytes
+        self._header_data = _LazySections(self._unpack_section)
         self._header_size = 0
+        self._header_padding_size = 0  # Characters in the header taken up by padding lines
+        self._newline = "\n"  # Line break of the file, used when the header is written
+        self._bom = b""  # UTF-8 byte order mark at the start of the file, written back first
 
-        self._unpack_header_data()
+        self._unpack_header_data(file_obj)
 
         if fileinfo_data is not None:
             self._header_data[self.FINF] = fileinfo_data
@@ -52,79 +169,178 @@ class AsciiHeaderParser(parser_interface.ParserInterface):
         if plugin_data is not None:
             self._header_data[self.PLUG] = plugin_data
 
-    def _unpack_header_data(self):
+        if self.header_padding > self._header_padding_size:
+            self._modified_sections.add(self.PADDING_SECTION)
+
+    @metrics.timed("read_header")
+    def _unpack_header_data(self, file_obj=None):
+        """
+        Find the end of the header with one search of the mapped file, and sort the header lines into sections.
+        Only the line offsets are kept, the content of a section is parsed the first time it's accessed, see _unpack_section.
+        """
+        with file_utils.open_binary(self.source, file_obj) as file_obj, file_utils.map_file(file_obj) as mapped:
+            if mapped is None:
+                self._header_bytes, over_read = read_header_bytes(file_obj)
+                if not file_obj.seekable():
+                    # The stream can't go back to the start of the scene content, keep what was read of it for save_as
+                    self._stream_tail = over_read
+            else:
+                header_end = find_header_end(mapped)
+                self._header_bytes = mapped[:header_end if header_end >= 0 else len(mapped)]
+
+        # Keep the line breaks of the file when the header is written again
+        first_line_end = self._header_bytes.find(b"\n")
+        self._newline = "\r\n" if first_line_end > 0 and self._header_bytes[first_line_end - 1] == ord("\r") else "\n"
+
+        # The first line has to be classified without the byte order mark, so it stays the first line
+        self._bom = codecs.BOM_UTF8 if self._header_bytes.startswith(codecs.BOM_UTF8) else b""
+
         self._header_size = 0
-        with open(self.filename, "r") as file_obj:
-            while True:
-                line_data = file_obj.readline()
-                if line_data.startswith("createNode") or line_data.startswith("// End of"):
+        section_prefixes = [(section, section.encode("utf-8")) for section in self.LINE_SECTIONS if section != self.UNKNOWN]
+        padding_prefixes = (self.PADDING_PREFIX.encode("utf-8"), self.PADDING_FILEINFO_PREFIX.encode("utf-8"))
+        header_offset = len(self._bom)
+        for line_data in io.BytesIO(self._header_bytes[header_offset:]):
+            self._header_size += 1
+            line_start = header_offset
+            header_offset += len(line_data)
+
+            # Padding is only there to reserve space, keep track of the size but don't keep the line
+            if line_data.lstrip().startswith(padding_prefixes):
+                self._header_padding_size += len(line_data)
+                continue
+
+            stripped_line = line_data.lstrip()
+            for section, prefix in section_prefixes:
+                if stripped_line.startswith(prefix):
                     break
-
-                self._header_size += 1
-
-                line_data = line_data.strip()
-                # Put all the comments in its own list
-                if line_data.startswith(self.COMMENT):
-                    self._header_data[self.COMMENT].append(line_data)
-
-                elif line_data.startswith(self.FILE):
-                    self._header_data[self.FILE].append(line_data)
-
-                # Get all unit settings in a list ["-l centimeter", "-a degree", "-t ntsc"]
-                # And the convert it to a dict to make it easier to search
-                elif line_data.startswith(self.UNITS):
-                    unit_list = re.findall("-[a-z]+ [a-z]+", line_data)
-                    unit_dict = {}
-                    for unit in unit_list:
-                        split_unit = unit.split(" ")
-                        unit_dict[split_unit[0]] = " ".join(split_unit[1:])
-                    self._header_data[self.UNITS] = unit_dict
-
-                # Get requirement (maya version/plugin)
-                # We split them up (maya version/plugin) in the internal dict as it's easier to handle
-                elif line_data.startswith(self.REQUIRES):
-                    data_split = line_data[len(self.REQUIRES):-1].replace("\"", "").split(" ")
-                    variable = data_split[0].strip("\"")
-                    value = " ".join(data_split[1:]).strip("\"")
-                    if variable == "maya":
-                        self._header_data[self.REQUIRES][str(variable)] = value
-                    else:
-                        self._header_data[self.PLUG][str(variable)] = value
-
-                elif line_data.startswith(self.FINF):
-                    data_split = line_data[len(self.FINF):-1].split(" ")
-                    variable = data_split[0].strip("\"")
-                    value = " ".join(data_split[1:]).strip("\"")
-                    self._header_data[self.FINF][str(variable)] = value
-
-                else:
-                    self._header_data[self.UNKNOWN].append(line_data)
-
-    def _pack_header_data(self) -> list:
-        header_list = []
-        for header_type in self._header_data:
-            if header_type == self.COMMENT:
-                header_list += [f"{item}\n" for item in self._header_data[self.COMMENT]]
-
-            if header_type == self.FILE:
-                header_list += [f"{item}\n" for item in self._header_data[self.FILE]]
+            else:
+                section = self.UNKNOWN
+
+            self._section_lines[section].append((line_start, header_offset))
+
+        metrics.add("lines_read", self._header_size)
+
+    def _iter_section_lines(self, section):
+        """ Yield the stripped lines of a section, undecodable bytes are kept as surrogates so they are written back unchanged """
+        header_bytes = self._header_bytes
+        for line_start, line_end in self._section_lines[section]:
+            yield header_bytes[line_start:line_end].decode("utf-8", "surrogateescape").strip()
+
+    @metrics.timed("decode_section")
+    def _unpack_section(self, section):
+        """ Parse one section of the header data """
+        # Put all the comments, file references and unknown lines in their own lists
+        if section in (self.COMMENT, self.FILE, self.UNKNOWN):
+            return list(self._iter_section_lines(section))
+
+        # Get all unit settings in a list ["-l centimeter", "-a degree", "-t ntsc"]
+        # And the convert it to a dict to make it easier to search
+        if section == self.UNITS:
+            unit_dict = {}
+            for line_data in self._iter_section_lines(self.UNITS):
+                unit_dict = unpack_units_line(line_data)
+            return unit_dict
+
+        # Get requirement (maya version/plugin)
+        # We split them up (maya version/plugin) in the internal dict as it's easier to handle
+        if section in (self.REQUIRES, self.PLUG):
+            requires_data = {self.REQUIRES: {}, self.PLUG: {}}
+            for line_data in self._iter_section_lines(self.REQUIRES):
+                variable, value = unpack_requires_line(line_data)
+                requires_data[self.REQUIRES if variable == "maya" else self.PLUG][variable] = value
+
+            # Both come from the same lines, fill in the other one as well unless it's already been parsed
+            other_section = self.PLUG if section == self.REQUIRES else self.REQUIRES
+            self._header_data.setdefault(other_section, requires_data[other_section])
+            return requires_data[section]
+
+        if section == self.FINF:
+            fileinfo_data = {}
+            for line_data in self._iter_section_lines(self.FINF):
+                variable, value = unpack_fileinfo_line(line_data)
+                fileinfo_data[variable] = value
+            return fileinfo_data
+
+        raise KeyError(section)
+
+    @metrics.timed("pack_header")
+    def _pack_header_data(self) -> bytes:
+        """ Pack all header lines, everything is written to one buffer and encoded once """
+        header_obj = io.StringIO(newline=self._newline)
+        self._write_header_data(header_obj)
+        return self._bom + header_obj.getvalue().encode("utf-8", "surrogateescape")
+
+    def _write_header_data(self, file_obj):
+        """ Write all header lines to a text file object """
+        write = file_obj.write
+        for header_type in self.SECTIONS:
+            if header_type in (self.COMMENT, self.FILE, self.UNKNOWN):
+                for item in self._header_data[header_type]:
+                    write(f"{item}\n")
 
             elif header_type == self.UNITS:
-                header_list.append(self.UNITS + " ".join([f"{key} {value}" for key, value in self._header_data[self.UNITS].items()]) + ";\n")
+                write(self.UNITS + " ".join([f"{key} {value}" for key, value in self._header_data[self.UNITS].items()]) + ";\n")
 
             elif header_type == self.REQUIRES:
-                header_list += [f"{self.REQUIRES}{key} \"{value}\";\n" for key, value in self._header_data[self.REQUIRES].items()]
+                for key, value in self._header_data[self.REQUIRES].items():
+                    write(f"{self.REQUIRES}{key} \"{value}\";\n")
 
             elif header_type == self.PLUG:
-                header_list += [f"{self.REQUIRES}\"{key}\" \"{value}\";\n" for key, value in self._header_data[self.PLUG].items()]
+                for key, value in self._header_data[self.PLUG].items():
+                    write(f"{self.REQUIRES}\"{key}\" \"{value}\";\n")
 
             elif header_type == self.FINF:
-                header_list += [f"{self.FINF}\"{key}\" \"{value}\";\n" for key, value in self._header_data[self.FINF].items()]
-
-            elif header_type == self.UNKNOWN:
-                header_list += [f"{item}\n" for item in self._header_data[self.UNKNOWN]]
-
-        return header_list
+                for key, value in self._header_data[self.FINF].items():
+                    write(f"{self.FINF}\"{key}\" \"{value}\";\n")
+
+    def _pack_padding_line(self, size: int):
+        """
+        Pack a comment line that is ignored by the parser, used to fill out unused space at the end of the header
+        :param size: Total size of the line in bytes including the line break
+        :return: The line bytes or None if a line of the given size can't be created
+        """
+        padding_line = self.PADDING_PREFIX.encode("utf-8")
+        newline = self._newline.encode("utf-8")
+        if size < len(padding_line) + len(newline):
+            return None
+
+        return padding_line + b" " * (size - len(padding_line) - len(newline)) + newline
+
+    def _pack_reserved_padding(self):
+        """ Pack a padding line of at least header_padding bytes, used to reserve space for later in place saves """
+        if self.header_padding <= 0:
+            return b""
+
+        return self._pack_padding_line(max(len(self.PADDING_PREFIX) + len(self._newline), self.header_padding))
+
+    def get_file_references(self) -> list:
+        return self._get_live_section(self.FILE)
+
+    def _get_live_section_names(self) -> dict:
+        return {**super()._get_live_section_names(), self.FILE: self.REFERENCES_SECTION}
+
+    def get_references(self) -> list:
+        """
+        Get the referenced files from the file commands in the header.
+        Maya writes a -rdi line for every reference in the hierarchy and a -r line for each top level reference,
+        both are merged into one FileReference per reference node
+        """
+        return parser_interface.merge_references(unpack_file_line(line_data) for line_data in self._header_data[self.FILE])
+
+    def get_header_bytes(self) -> bytes:
+        return self._header_bytes
+
+    def get_body_offset(self) -> int:
+        # The header is every line before the first createNode or the end of file comment, see find_header_end
+        return len(self._header_bytes)
+
+    def get_units(self) -> dict:
+        units = {}
+        for unit_name, flags in (("linear", ("-l", "-linear")), ("angle", ("-a", "-angle")), ("time", ("-t", "-time"))):
+            for flag in flags:
+                if flag in self._header_data[self.UNITS]:
+                    units[unit_name] = self._header_data[self.UNITS][flag]
+        return units
 
     def get_maya_version(self) -> int:
         for key in self._header_data[self.REQUIRES]:
@@ -134,27 +350,82 @@ class AsciiHeaderParser(parser_interface.ParserInterface):
     def set_maya_version(self, version: int):
         for key in self._header_data[self.REQUIRES]:
             if key == "maya":
-                self._header_data[self.REQUIRES][key] = str(version)
+                if self._header_data[self.REQUIRES][key] != str(version):
+                    self._header_data[self.REQUIRES][key] = str(version)
+                    self._modified_sections.add(self.VERSION_SECTION)
                 break
 
+    def _find_body_offset(self, file_obj) -> int:
+        """
+        Get the byte offset of the first line after the header. The offset found when the header was read is used as
+        long as the file still has a header end there, it's only searched again if the file changed on disk since then
+        """
+        body_offset = len(self._header_bytes)
+        file_obj.seek(body_offset)
+        body_start = file_obj.read(max(len(marker) for marker in HEADER_END_MARKERS))
+        if not body_start or body_start.startswith(HEADER_END_MARKERS):
+            return body_offset
+
+        self.log.warning(f"Header of {self.filename} changed on disk since it was read, searching for the header end again")
+        file_obj.seek(0)
+        return len(read_header_bytes(file_obj)[0])
+
+    @metrics.timed("save_as")
     def save_as(self, filename):
-
-        orig_file_data = []
-        with open(self.filename, "r") as file_obj:
-            orig_file_data = file_obj.readlines()
-
-        header_end = 0
-        for line in orig_file_data:
-            if line.startswith("createNode"):
-                break
-            header_end += 1
-
-        no_header_file_data = orig_file_data[header_end:]
-        new_header_file_data = self._pack_header_data()
-        new_file_data = new_header_file_data + no_header_file_data
-
-        with open(filename, "w", encoding="utf-8") as file_obj:
-            file_obj.writelines(new_file_data)
+        """ Save to new file, the content is streamed from the current file so memory use doesn't depend on file size """
+
+        padding_bytes = self._pack_reserved_padding()
+        header_bytes = self._pack_header_data() + padding_bytes
+        with file_utils.open_binary(self.source) as src_obj:
+            body_offset = self._find_body_offset(src_obj) if src_obj.seekable() else None
+            with file_utils.atomic_write(filename, self.filename) as dst_obj:
+                dst_obj.write(header_bytes)
+                self._copy_body(src_obj, dst_obj, body_offset)
+
+        cache.invalidate(filename)
+        if self._is_current_file(filename):
+            self._set_header_bytes(header_bytes, len(padding_bytes))
+            self._mark_saved()
+
+    def _set_header_bytes(self, header_bytes, padding_size):
+        """ Keep the header that was just written as the current one, every section is already parsed at this point """
+        self._header_bytes = header_bytes
+        self._header_padding_size = padding_size
+
+    @metrics.timed("save_in_place")
+    def _save_in_place(self) -> bool:
+        """
+        Overwrite the header directly in the current file, the scene content is never read or moved.
+        Any space left over at the end of the header is filled with a padding comment line.
+        Only the blocks of the header that differ from the file are written.
+        :return: False if the new header doesn't fit in the space of the current header, or the file changed on disk
+            since the header was read
+        """
+        header_bytes = self._pack_header_data()
+        with metrics.open_file(self.filename, "r+b") as file_obj:
+            # The header on disk has to be the one we read, otherwise unchanged looking blocks can hold other edits
+            body_offset = len(self._header_bytes)
+            disk_bytes = file_obj.read(body_offset + max(len(marker) for marker in HEADER_END_MARKERS))
+            body_start = disk_bytes[body_offset:]
+            if disk_bytes[:body_offset] != self._header_bytes or (body_start and not body_start.startswith(HEADER_END_MARKERS)):
+                self.log.warning(f"Header of {self.filename} changed on disk since it was read, rewriting the file")
+                return False
+
+            free_size = body_offset - len(header_bytes)
+            if free_size < 0:
+                return False
+
+            if free_size:
+                padding = self._pack_padding_line(free_size)
+                if padding is None:
+                    return False
+                header_bytes += padding
+
+            file_utils.write_changed_ranges(file_obj, 0, self._header_bytes, header_bytes)
+
+        self._set_header_bytes(header_bytes, free_size)
+        cache.invalidate(self.filename)
+        return True
 
 
 if __name__ == "__main__":
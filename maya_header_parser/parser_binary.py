@@ -4,14 +4,54 @@ import logging
 from collections import namedtuple
 import pprint
 
-from maya_header_parser import parser_interface
+from maya_header_parser import parser_interface, file_utils, metrics, cache
 
 def be_word4(buf):
     return struct.unpack('>L', buf)[0]
 
 
+def unpack_record(buf, data_offset, data_length) -> tuple:
+    """ Decode a header record as (name, value), the name is everything up to the first null and the value up to the last """
+    data_end = data_offset + data_length
+    name_end = buf.find(b"\x00", data_offset, data_end)
+    with memoryview(buf) as view:
+        if name_end == -1:
+            return str(view[data_offset:data_end], "utf-8"), ""
+
+        value_end = buf.rfind(b"\x00", name_end + 1, data_end)
+        if value_end == -1:
+            value_end = name_end + 1
+
+        return str(view[data_offset:name_end], "utf-8"), str(view[name_end + 1:value_end], "utf-8")
+
+
+def unpack_reference_record(data, depth_info=False) -> parser_interface.FileReference:
+    """
+    Decode the data of a FREF or FRDI chunk, the values are null separated. Flags are read like the ascii file command,
+    otherwise the first value is the path, FRDI (depth_info) chunks have the depth in front of it
+    """
+    args = [arg.decode("utf-8", "replace") for arg in bytes(data).split(b"\x00") if arg]
+    if any(arg.startswith("-") for arg in args):
+        return parser_interface.unpack_reference_args(args)
+
+    depth = 1
+    if depth_info and args and args[0].isdigit():
+        depth = int(args.pop(0))
+    return parser_interface.FileReference(path=args[0] if args else None, namespace=None, reference_node=None, depth=depth,
+                                          file_type=None, deferred=False)
+
+
 IffChunk = namedtuple("IffChunk", ["typeid", "data_offset", "data_length"])
 
+# Chunk in the scene content, offset is where the chunk header starts. form_type is the type of a group (FOR8/LIS8/CAT8),
+# for nodes that's the node type tag, None for data chunks. depth is 1 for chunks directly in the main chunk
+BodyChunk = namedtuple("BodyChunk", ["typeid", "form_type", "offset", "data_length", "depth"])
+
+
+def chunk_type_name(typeid) -> str:
+    """ Get the 4 character name of a typeid, like "FOR8" """
+    return struct.pack(">L", typeid).decode("latin-1") if typeid is not None else None
+
 
 class BinaryHeaderParser(parser_interface.ParserInterface):
     """
@@ -59,22 +99,37 @@ class BinaryHeaderParser(parser_interface.ParserInterface):
     FINF = be_word4(b"FINF")
     PLUG = be_word4(b"PLUG")
 
-    def __init__(self, filename, fileinfo_data:dict=None, plugin_data:dict=None):
-        super().__init__(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data)
+    # File references, written as chunks (or a group of chunks) right after the HEAD chunk. FRDI (reference depth info,
+    # file -rdi in ascii files) is written for every reference in the hierarchy, FREF (file -r) for the top level ones
+    FREF = be_word4(b"FREF")
+    FRDI = be_word4(b"FRDI")
+    REFERENCE_TYPES = (FREF, FRDI)
+
+    # Group chunks, their data starts with a form type and holds other chunks
+    LIS8 = be_word4(b"LIS8")
+    CAT8 = be_word4(b"CAT8")
+    GROUP_TYPES = (FOR8, LIS8, CAT8)
+
+    # Bytes read from the start of the file in one go, to get the main/head chunk and (most of the time) all header data
+    HEAD_READ_SIZE = 64 * 1024
+
+    def __init__(self, filename, fileinfo_data:dict=None, plugin_data:dict=None, header_padding=0, file_obj=None):
+        super().__init__(filename, fileinfo_data=fileinfo_data, plugin_data=plugin_data, header_padding=header_padding, file_obj=file_obj)
 
         self.log = logging.getLogger("maya_header_parser")
 
-        self.filename = filename
         self._header_struct = struct.Struct(">LxxxxQ")
         self._main_chunk: IffChunk = None
         self._head_chunk: IffChunk = None
         self._content_block: IffChunk = None  # Rest of the file, we only care about the header part right now
-        self._head_data_byte = b""
-        self._head_data_raw = b""
-        self._content_data_byte = b""
+        self._head_buffer = b""  # Start of the file, up to the end of the HEAD chunk
+        self._head_data_raw = memoryview(b"")  # HEAD chunk data, view into _head_buffer
+        self._head_records = []  # (typeid, data_offset, data_length) of each record in _head_buffer
+        self._head_padding_size = 0  # Bytes in the HEAD chunk taken up by padding records
+        self._body_chunks = {}  # {max_depth: list of BodyChunk}, filled the first time the content is walked to the end
         self._header_data = {}
 
-        self._get_all_chunks()
+        self._get_all_chunks(file_obj)
 
         if fileinfo_data is not None:
             self._header_data[self.FINF] = self._convert_str_dict_to_byte_dict(fileinfo_data)
@@ -82,43 +137,82 @@ class BinaryHeaderParser(parser_interface.ParserInterface):
         if plugin_data is not None:
             self._header_data[self.PLUG] = self._convert_str_dict_to_byte_dict(plugin_data)
 
-    def _get_all_chunks(self):
-        """ Fetch all chunks to make it easier to jump to specific data """
-        with open(self.filename, "rb") as file_obj:
-            self._get_main_chunk(file_obj)
-            self._get_head_chunk(file_obj)
-            self._get_content_block(file_obj)
-            self._header_data = self._unpack_header_data(file_obj)
-
-            # pprint.pprint(self._header_data)
-
-    def _get_main_chunk(self, file_obj):
+        if self._head_chunk and self.header_padding > self._head_padding_size:
+            self._modified_sections.add(self.PADDING_SECTION)
+
+    @property
+    def _header_data(self) -> dict:
+        """ Header records as {typeid: {name: value}}, the records are only decoded the first time they are needed """
+        if self._header_data_cache is None:
+            self._header_data_cache = self._unpack_header_data()
+        return self._header_data_cache
+
+    @_header_data.setter
+    def _header_data(self, value):
+        self._header_data_cache = value
+
+    @metrics.timed("read_header")
+    def _get_all_chunks(self, file_obj=None):
+        """
+        Fetch all chunks to make it easier to jump to specific data.
+        The start of the file is read in one go, most of the time that covers the entire HEAD chunk.
+        """
+        with file_utils.open_binary(self.source, file_obj) as file_obj:
+            buf = file_obj.read(self.HEAD_READ_SIZE)
+
+            if not self._get_main_chunk(buf) or not self._get_head_chunk(buf):
+                return
+
+            head_end = self._head_chunk.data_offset + self._head_chunk.data_length - 4
+            if len(buf) < head_end:
+                buf += file_obj.read(head_end - len(buf))
+
+            if not file_obj.seekable():
+                # The stream can't go back to the start of the scene content, keep what was read of it for save_as
+                self._stream_tail = bytes(buf[head_end:])
+
+        # Only keep the HEAD chunk, not the rest of the first read
+        self._set_head_buffer(buf[:head_end])
+        self._get_content_block(None)
+        self._header_data = None
+
+    def _set_head_buffer(self, buf):
+        """ Use buf as the start of the file up to the end of the HEAD chunk, and index its records """
+        self._head_buffer = buf
+        self._head_data_raw = memoryview(buf)[self._head_chunk.data_offset:]
+        self._head_records = self._index_header_records()
+
+    def _get_main_chunk(self, buf) -> bool:
         """ Gets the length of the entire file and offset to the first chunk (Head)"""
-        buf = file_obj.read(self._header_struct.size)
-        typeid, data_length = self._header_struct.unpack(buf)
-        buf = file_obj.read(4)
-        chunk_type = struct.unpack(">L", buf)[0]
+        data_offset = self._header_struct.size + 4
+        if len(buf) < data_offset:
+            self.log.warning(f"This dose not look like a maya file {self.filename}")
+            return False
+
+        typeid, data_length = self._header_struct.unpack_from(buf, 0)
+        chunk_type = struct.unpack_from(">L", buf, self._header_struct.size)[0]
         if not chunk_type == self.MAYA:
             self.log.warning(f"This dose not look like a maya file {self.filename}")
-            return []
+            return False
 
-        data_offset = file_obj.tell()
         self._main_chunk = IffChunk(typeid=typeid, data_offset=data_offset, data_length=data_length)
+        return True
 
-    def _get_head_chunk(self, file_obj):
+    def _get_head_chunk(self, buf) -> bool:
         """ Get the offset and length of the header data """
-        file_obj.seek(self._main_chunk.data_offset)
+        data_offset = self._main_chunk.data_offset + self._header_struct.size + 4
+        if len(buf) < data_offset:
+            self.log.warning("Could not find maya info/header")
+            return False
 
-        buf = file_obj.read(self._header_struct.size)
-        typeid, data_length = self._header_struct.unpack(buf)
-        buf = file_obj.read(4)
-        chunk_type = struct.unpack(">L", buf)[0]
+        typeid, data_length = self._header_struct.unpack_from(buf, self._main_chunk.data_offset)
+        chunk_type = struct.unpack_from(">L", buf, self._main_chunk.data_offset + self._header_struct.size)[0]
         if not chunk_type == self.HEAD:
             self.log.warning("Could not find maya info/header")
-            return []
+            return False
 
-        data_offset = file_obj.tell()
         self._head_chunk = IffChunk(typeid=typeid, data_offset=data_offset, data_length=data_length)
+        return True
 
     def _get_content_block(self, file_obj):
         """ Not real chunk but the rest of the file after head"""
@@ -126,75 +220,117 @@ class BinaryHeaderParser(parser_interface.ParserInterface):
         data_length = self._main_chunk.data_length - data_offset + 20
         self._content_block = IffChunk(typeid=self.FOR8, data_offset=data_offset, data_length=data_length)
 
-    def _get_content_data(self, file_obj):
-        """ Retrieve data for content based on """
-        file_obj.seek(self._content_block.data_offset)
-        return file_obj.read(self._content_block.data_length)
-
-    def _unpack_header_data(self, file_obj) -> dict:
-        data_end = self._head_chunk.data_length + self._head_chunk.data_offset
+    @metrics.timed("index_records")
+    def _index_header_records(self) -> list:
+        """ Walk the HEAD chunk and collect the offset of each record, without copying or decoding any data """
+        buf = self._head_buffer
+        data_end = self._head_chunk.data_offset + len(self._head_data_raw)
+        padding_name = self.PADDING_NAME.encode(self.UTF8) + b"\x00"
         current_offset = self._head_chunk.data_offset
-        info_data = {}
-        while True:
-            file_obj.seek(current_offset)
-            buf = file_obj.read(self._header_struct.size)
-            typeid, data_length = self._header_struct.unpack(buf)
-
-            if current_offset >= data_end or typeid == self.FOR8:
+        records = []
+        self._head_padding_size = 0
+        while current_offset + self._header_struct.size <= data_end:
+            typeid, data_length = self._header_struct.unpack_from(buf, current_offset)
+            if typeid == self.FOR8:
                 break
 
-            data_offset = file_obj.tell()
-            data = file_obj.read(data_length)
-            self._head_data_raw += data
+            data_offset = current_offset + self._header_struct.size
 
-            # Reformatting data to a dict format, so it's easier to handle
-            if not info_data.get(typeid):
-                info_data[typeid] = {}
+            # Head info chunks always is a full 8 bytes
+            next_offset = math.ceil((data_offset + data_length) / 8) * 8
 
-            data_split = data.split(b"\x00")
-            name = data_split[0]
-            value = b"\x00".join(data_split[1:-1])
+            # Padding is only there to reserve space, keep track of the size but don't expose it as fileinfo
+            if typeid == self.FINF and buf.startswith(padding_name, data_offset):
+                self._head_padding_size += next_offset - current_offset
+            else:
+                records.append((typeid, data_offset, data_length))
 
-            info_data[typeid][name.decode(self.UTF8)] = value.decode(self.UTF8)
+            current_offset = next_offset
 
-            # Head info chunks always is a full 8 bytes
-            current_offset = math.ceil((data_offset + data_length) / 8) * 8
+        metrics.add("records_indexed", len(records))
+        return records
 
+    def _unpack_header_record(self, data_offset, data_length) -> tuple:
+        return unpack_record(self._head_buffer, data_offset, data_length)
+
+    @metrics.timed("decode_records")
+    def _unpack_header_data(self) -> dict:
+        """ Reformatting data to a dict format, so it's easier to handle """
+        info_data = {}
+        for typeid, data_offset, data_length in self._head_records:
+            name, value = self._unpack_header_record(data_offset, data_length)
+            info_data.setdefault(typeid, {})[name] = value
+
+        metrics.add("records_decoded", len(self._head_records))
         return info_data
 
     def _generate_main_chunk_bytes(self):
         """ Generate a new main chunk based on the size of the new head chunk"""
-        return self._header_struct.pack(self.FOR8, self._main_chunk.data_length + 4) + b"Maya"
+        return self._header_struct.pack(self.FOR8, self._main_chunk.data_length) + b"Maya"
 
     def _generate_head_chunk_bytes(self):
         """ Generate a new head chunk based on the size of the header data"""
-        return self._header_struct.pack(self.FOR8, self._head_chunk.data_length + 4) + b"HEAD"
+        return self._header_struct.pack(self.FOR8, self._head_chunk.data_length) + b"HEAD"
+
+    def _update_chunk_sizes(self, head_data_size):
+        """ Update main/head chunk lengths to fit header data of the given size, the HEAD tag is part of the length """
+        new_head_data_diff = head_data_size + 4 - self._head_chunk.data_length
+        self._head_chunk = IffChunk(typeid=self.FOR8, data_offset=self._head_chunk.data_offset, data_length=head_data_size + 4)
+        self._main_chunk = IffChunk(typeid=self.FOR8, data_offset=self._main_chunk.data_offset, data_length=(self._main_chunk.data_length + new_head_data_diff))
 
-    def _pack_header_data(self):
-        head_bytes = b""
+    def _pack_padding_record(self, size: int):
+        """
+        Pack a PADDING_NAME fileinfo record, used to fill out unused space in the HEAD chunk.
+        The parsers skip it, but Maya loads it like any other fileinfo
+        :param size: Total size of the record including the record header, must be a multiple of 8
+        :return: The record bytes or None if a record of the given size can't be created
+        """
+        name = self.PADDING_NAME.encode(self.UTF8) + b"\x00"
+        data_length = size - self._header_struct.size
+        if size % 8 or data_length < len(name) + 1:
+            return None
+
+        return self._header_struct.pack(self.FINF, data_length) + name + b" " * (data_length - len(name) - 1) + b"\x00"
+
+    def _pack_reserved_padding(self):
+        """ Pack a padding record of at least header_padding bytes, used to reserve space for later in place saves """
+        if self.header_padding <= 0:
+            return b""
+
+        min_size = self._header_struct.size + math.ceil((len(self.PADDING_NAME) + 2) / 8) * 8
+        return self._pack_padding_record(max(min_size, math.ceil(self.header_padding / 8) * 8))
+
+    @metrics.timed("pack_header")
+    def _pack_header_data(self) -> bytearray:
+        """ Pack all header records, the sizes are collected first so everything is written into one preallocated buffer """
+        records = []
+        total_size = 0
         for typeid, type_data in self._header_data.items():
-            first = True
             for name, value in type_data.items():
                 # Check if we have a header with only value or variable and value
-                name = name.encode(self.UTF8)
-                value = value.encode(self.UTF8)
+                full_item = name.encode(self.UTF8)
+                if value:
+                    full_item += b"\x00" + value.encode(self.UTF8) + b"\x00"
 
-                full_item = name
-                if len(value):
-                    full_item = name + b"\x00" + value + b"\x00"
+                records.append((typeid, full_item))
+                total_size += self._header_struct.size + math.ceil(len(full_item) / 8) * 8
 
-                full_item_size = len(full_item)
+        head_bytes = bytearray(total_size)
+        offset = 0
+        previous_typeid = None
+        for typeid, full_item in records:
+            self._header_struct.pack_into(head_bytes, offset, typeid, len(full_item))
 
-                item_chunk = self._header_struct.pack(typeid, full_item_size)
+            # This might not be needed as it all works, but I notice that the first header var always had an F
+            if typeid != previous_typeid:
+                head_bytes[offset + 4] = ord("F")
+                previous_typeid = typeid
 
-                # This might not be needed as it all works, but I notice that the first header var always had an F
-                if first:
-                    item_chunk = item_chunk[:4] + b"F" + item_chunk[5:]
+            offset += self._header_struct.size
+            head_bytes[offset:offset + len(full_item)] = full_item
 
-                buffer = b"\x00" * ((math.ceil((full_item_size/8))*8) - full_item_size)
-                head_bytes += item_chunk + full_item + buffer
-
-                first = False
+            # The rest of the 8 byte block is already zero filled
+            offset += math.ceil(len(full_item) / 8) * 8
 
         return head_bytes
 
@@ -221,43 +357,229 @@ class BinaryHeaderParser(parser_interface.ParserInterface):
         return readable_head
 
     def get_raw_head_data(self):
-        with open(self.filename, "rb") as file_obj:
-            file_obj.seek(self._head_chunk.data_offset)
-            data = file_obj.read(self._head_chunk.data_length)
-            self._print_byte_data(data)
+        self._print_byte_data(bytes(self._head_data_raw))
+
+    def get_references(self) -> list:
+        """
+        Get the referenced files from the FRDI/FREF chunks that follow the HEAD chunk, the depth comes from the FRDI
+        chunks and both are merged into one FileReference per reference node like in ascii files.
+        Other data chunks in between are skipped, reading stops at the first node group so the rest of the scene is
+        never touched
+        """
+        references = []
+        with file_utils.open_binary(self.source) as file_obj:
+            for chunk in self._walk_body_chunks(file_obj, max_depth=1):
+                if chunk.typeid in self.REFERENCE_TYPES:
+                    file_obj.seek(chunk.offset + self._header_struct.size)
+                    data = file_obj.read(chunk.data_length)
+                    references.append(unpack_reference_record(data, depth_info=chunk.typeid == self.FRDI))
+                elif chunk.form_type in self.REFERENCE_TYPES:
+                    file_obj.seek(chunk.offset + self._header_struct.size + 4)
+                    group_data = file_obj.read(chunk.data_length - 4)
+                    for child_typeid, child_offset, child_length in self._iter_records(group_data):
+                        data = group_data[child_offset:child_offset + child_length]
+                        references.append(unpack_reference_record(data, depth_info=chunk.form_type == self.FRDI))
+                elif chunk.form_type is not None:
+                    break
+
+        return parser_interface.merge_references(references)
+
+    def _iter_records(self, buf):
+        """ Yield (typeid, data_offset, data_length) of each chunk in buf, chunks are padded to 8 bytes """
+        offset = 0
+        while offset + self._header_struct.size <= len(buf):
+            typeid, data_length = self._header_struct.unpack_from(buf, offset)
+            yield typeid, offset + self._header_struct.size, data_length
+            offset = math.ceil((offset + self._header_struct.size + data_length) / 8) * 8
+
+    def _walk_body_chunks(self, file_obj, max_depth=1):
+        """
+        Yield a BodyChunk for every chunk after the HEAD chunk, depth first.
+        Only the chunk headers are read, payloads are skipped with a seek. Groups are walked into up to max_depth
+        """
+        chunk_size = self._header_struct.size
+        main_end = self._main_chunk.data_offset - 4 + self._main_chunk.data_length
+
+        # (offset of the next chunk, end of the group) of each group being walked
+        stack = [(self._content_block.data_offset, main_end)]
+        while stack:
+            offset, group_end = stack[-1]
+            if offset + chunk_size > group_end:
+                stack.pop()
+                continue
+
+            file_obj.seek(offset)
+            chunk_header = file_obj.read(chunk_size + 4)
+            if len(chunk_header) < chunk_size:
+                self.log.warning(f"Chunk at offset {offset} is cut short in {self.filename}")
+                return
+
+            typeid, data_length = self._header_struct.unpack_from(chunk_header)
+            chunk_end = offset + chunk_size + data_length
+            if chunk_end > group_end:
+                self.log.warning(f"Chunk at offset {offset} runs past the end of its group in {self.filename}")
+                return
+
+            is_group = typeid in self.GROUP_TYPES and len(chunk_header) == chunk_size + 4
+            form_type = struct.unpack_from(">L", chunk_header, chunk_size)[0] if is_group else None
+            yield BodyChunk(typeid=typeid, form_type=form_type, offset=offset, data_length=data_length, depth=len(stack))
+
+            stack[-1] = (math.ceil(chunk_end / 8) * 8, group_end)
+            if is_group and len(stack) < max_depth:
+                stack.append((offset + chunk_size + 4, chunk_end))
+
+    def iter_body_chunks(self, max_depth=1):
+        """
+        Iterate over the chunks of the scene content without reading their data, see BodyChunk.
+        The chunks are cached the first time the content is walked to the end, later calls don't touch the file
+        :param max_depth: 1 for the chunks directly in the main chunk (mostly node groups), higher to walk into groups
+        """
+        if max_depth in self._body_chunks:
+            yield from self._body_chunks[max_depth]
+            return
+
+        chunks = []
+        with file_utils.open_binary(self.source) as file_obj:
+            for chunk in self._walk_body_chunks(file_obj, max_depth):
+                chunks.append(chunk)
+                yield chunk
+
+        self._body_chunks[max_depth] = chunks
+
+    def find_body_chunks(self, typeid, max_depth=1) -> list:
+        """
+        Get the chunks of a type, groups match on their form type as well
+        :param typeid: Type as int, bytes or str, like "XFRM" or b"MESH"
+        """
+        if isinstance(typeid, str):
+            typeid = typeid.encode("latin-1")
+        if isinstance(typeid, bytes):
+            typeid = be_word4(typeid)
+
+        return [chunk for chunk in self.iter_body_chunks(max_depth) if typeid in (chunk.typeid, chunk.form_type)]
+
+    def get_body_summary(self, max_depth=1) -> dict:
+        """ Get {type name: (count, total bytes)} of the chunks, groups are counted by their form type """
+        summary = {}
+        for chunk in self.iter_body_chunks(max_depth):
+            name = chunk_type_name(chunk.form_type if chunk.form_type is not None else chunk.typeid)
+            count, size = summary.get(name, (0, 0))
+            summary[name] = (count + 1, size + self._header_struct.size + chunk.data_length)
+        return summary
+
+    def get_header_bytes(self) -> bytes:
+        return bytes(self._head_data_raw)
+
+    def get_body_offset(self) -> int:
+        return self._content_block.data_offset
+
+    def get_units(self) -> dict:
+        units = {}
+        for unit_name, typeid in (("linear", self.LUNI), ("angle", self.AUNI), ("time", self.TUNI)):
+            if self._header_data.get(typeid):
+                units[unit_name] = next(iter(self._header_data[typeid]))
+        return units
 
     def get_maya_version(self) -> int:
+        # Only decode the version record if nothing else has been decoded yet
+        if self._header_data_cache is None:
+            for typeid, data_offset, data_length in self._head_records:
+                if typeid == self.VERS:
+                    return int(self._unpack_header_record(data_offset, data_length)[0])
+
         return int(next(iter(self._header_data[self.VERS])))
 
     def set_maya_version(self, version: int):
-        self._header_data[self.VERS] = {str(version): ""}
+        if self._header_data.get(self.VERS) != {str(version): ""}:
+            self._header_data[self.VERS] = {str(version): ""}
+            self._modified_sections.add(self.VERSION_SECTION)
 
+    @metrics.timed("save_as")
     def save_as(self, filename):
-        """ Save to new file """
+        """ Save to new file, the content is streamed from the current file so memory use doesn't depend on file size """
 
         filename = filename or self.filename
-
-        # self._update_head_data()
-
-        # Only read in the full content if we need, most of the time we would only read the header data
-        if not self._content_data_byte:
-            with open(self.filename, "rb") as file_obj:
-                self._content_data_byte = self._get_content_data(file_obj)
-
+        is_current_file = self._is_current_file(filename)
+
+        # Decode every record while the chunks still describe the HEAD data we read
+        self._header_data
+        chunks = (self._main_chunk, self._head_chunk, self._content_block)
+        try:
+            with file_utils.open_binary(self.source) as src_obj:
+                if src_obj.seekable():
+                    self._check_chunks(src_obj)
+                content_offset = self._content_block.data_offset
+
+                padding_bytes = self._pack_reserved_padding()
+                head_data_bytes = self._pack_header_data() + padding_bytes
+                self._update_chunk_sizes(len(head_data_bytes))
+                chunk_bytes = self._generate_main_chunk_bytes() + self._generate_head_chunk_bytes()
+
+                with file_utils.atomic_write(filename, self.filename) as dst_obj:
+                    dst_obj.write(chunk_bytes)
+                    dst_obj.write(head_data_bytes)
+                    self._copy_body(src_obj, dst_obj, content_offset)
+        except BaseException:
+            self._main_chunk, self._head_chunk, self._content_block = chunks
+            raise
+
+        cache.invalidate(filename)
+        if is_current_file:
+            self._get_content_block(None)
+            self._body_chunks = {}
+            self._set_head_buffer(bytes(chunk_bytes + head_data_bytes))
+            self._mark_saved()
+        else:
+            # The chunks should keep describing the file we read from
+            self._main_chunk, self._head_chunk, self._content_block = chunks
+
+    def _check_chunks(self, file_obj):
+        """
+        Read the main/HEAD chunk headers of the file again, and use them if the file was rewritten by another tool
+        since the header was read, so the scene content is copied from where it is now
+        """
+        data_offset = self._head_chunk.data_offset
+        file_obj.seek(0)
+        buf = file_obj.read(data_offset)
+        if buf == self._head_buffer[:data_offset]:
+            return
+
+        self.log.warning(f"The chunks of {self.filename} changed on disk since the header was read")
+        if not self._get_main_chunk(buf) or not self._get_head_chunk(buf):
+            raise ValueError(f"{self.filename} is no longer a maya binary file")
+        self._get_content_block(None)
+
+    @metrics.timed("save_in_place")
+    def _save_in_place(self) -> bool:
+        """
+        Overwrite the header data directly in the current file, the scene content is never read or moved.
+        Any space left over in the HEAD chunk is filled with a padding record.
+        The chunk sizes don't change, so only the blocks of header data that differ from the file are written.
+        :return: False if the new header data doesn't fit in the current HEAD chunk, or the file changed on disk
+            since the header was read
+        """
         head_data_bytes = self._pack_header_data()
-        new_head_data_diff = len(head_data_bytes) - self._head_chunk.data_length
-        self._head_chunk = IffChunk(typeid=self.FOR8, data_offset=self._head_chunk.data_offset, data_length=len(head_data_bytes))
-        self._main_chunk = IffChunk(typeid=self.FOR8, data_offset=self._main_chunk.data_offset, data_length=(self._main_chunk.data_length + new_head_data_diff))
-
-        file_data = (
-                self._generate_main_chunk_bytes() +
-                self._generate_head_chunk_bytes() +
-                head_data_bytes +
-                self._content_data_byte
-        )
-
-        with open(filename, "wb") as file_obj:
-            file_obj.write(file_data)
+        free_size = self._head_chunk.data_length - 4 - len(head_data_bytes)
+        if free_size < 0:
+            return False
+
+        if free_size:
+            padding = self._pack_padding_record(free_size)
+            if padding is None:
+                return False
+            head_data_bytes += padding
+
+        with metrics.open_file(self.filename, "r+b") as file_obj:
+            # The chunk headers and HEAD data on disk have to be what we read, otherwise the offsets are wrong
+            if file_obj.read(len(self._head_buffer)) != self._head_buffer:
+                self.log.warning(f"Header of {self.filename} changed on disk since it was read, rewriting the file")
+                return False
+
+            file_utils.write_changed_ranges(file_obj, self._head_chunk.data_offset, self._head_data_raw, head_data_bytes)
+
+        self._set_head_buffer(bytes(self._head_buffer[:self._head_chunk.data_offset]) + head_data_bytes)
+        cache.invalidate(self.filename)
+        return True
 
 
 if __name__ == "__main__":
@@ -1,5 +1,87 @@
+import os
+import copy
 import logging
 from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from maya_header_parser import file_utils
+
+
+def unescape_fileinfo(value: str) -> str:
+    """ Remove extra escape characters so we return same data that was sent in """
+    value = value.replace("\\\\", "\\")
+    value = value.replace("\\\"", "\"")
+    return value
+
+
+FileReference = namedtuple("FileReference", ["path", "namespace", "reference_node", "depth", "file_type", "deferred"])
+
+# Number of values taken by the flags of the file command that can show up in reference commands
+REFERENCE_FLAG_ARGS = {
+    "-r": 0, "-reference": 0,
+    "-rdi": 1, "-referenceDepthInfo": 1,
+    "-ns": 1, "-namespace": 1,
+    "-rfn": 1, "-referenceNode": 1,
+    "-typ": 1, "-type": 1,
+    "-dr": 1, "-deferReference": 1,
+    "-op": 1, "-options": 1,
+    "-rpr": 1, "-renamingPrefix": 1,
+    "-shd": 1, "-sharedNodes": 1,
+    "-sns": 2, "-swapNamespace": 2,
+    "-gl": 0, "-groupLocator": 0,
+    "-lck": 1, "-lockReference": 1,
+}
+
+
+def unpack_reference_args(args) -> FileReference:
+    """
+    Get a FileReference from the arguments of a reference file command, like
+    ['-rdi', '1', '-ns', 'rig', '-rfn', 'rigRN', '-typ', 'mayaAscii', '/proj/rig.ma'], the path is the last argument.
+    References without -rdi are top level references (depth 1)
+    """
+    flags = {}
+    path = None
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg.startswith("-") and index < len(args) - 1:
+            arg_count = REFERENCE_FLAG_ARGS.get(arg)
+            if arg_count is None:
+                # Unknown flag, assume it takes a value unless it's followed by another flag
+                arg_count = 0 if args[index + 1].startswith("-") else 1
+            flags[arg] = args[index + 1:index + 1 + arg_count]
+            index += 1 + arg_count
+        else:
+            path = arg
+            index += 1
+
+    def flag_value(short_name, long_name, default=None):
+        values = flags.get(short_name) or flags.get(long_name)
+        return values[0] if values else default
+
+    return FileReference(
+        path=path,
+        namespace=flag_value("-ns", "-namespace"),
+        reference_node=flag_value("-rfn", "-referenceNode"),
+        depth=int(flag_value("-rdi", "-referenceDepthInfo", 1)),
+        file_type=flag_value("-typ", "-type"),
+        deferred=flag_value("-dr", "-deferReference", "0") == "1",
+    )
+
+
+def merge_references(references) -> list:
+    """
+    Merge the depth info entries (file -rdi, FRDI) and top level entries (file -r, FREF) of the same reference into
+    one FileReference per reference node, in the order they were first seen
+    """
+    merged = {}
+    for reference in references:
+        key = reference.reference_node or (reference.path, reference.namespace)
+        if key not in merged:
+            merged[key] = reference
+        elif reference.deferred:
+            merged[key] = merged[key]._replace(deferred=True)
+    return list(merged.values())
 
 
 class ParserInterface(ABC):
@@ -7,14 +89,82 @@ class ParserInterface(ABC):
     FINF = "FINF"
     PLUG = "PLUG"
 
-    def __init__(self, filename, fileinfo_data=None, plugin_data=None):
+    # Header sections that are tracked for changes, see get_modified_sections
+    FILEINFO_SECTION = "fileinfo"
+    PLUGIN_SECTION = "plugins"
+    VERSION_SECTION = "version"
+    UNITS_SECTION = "units"
+    REFERENCES_SECTION = "references"
+    PADDING_SECTION = "padding"
+
+    # Name of the fileinfo that fills out unused space in .mb headers. Maya doesn't know about it, it shows up as a
+    # regular fileinfo in Maya and is kept when Maya saves the scene again, the parsers never expose it
+    PADDING_NAME = "mhpPadding"
+
+    # Whether the file references are part of the header bytes, see get_header_bytes
+    HEADER_HAS_REFERENCES = False
+
+    def __init__(self, filename, fileinfo_data=None, plugin_data=None, header_padding=0, file_obj=None):
+        """
+        :param filename: Maya file to read, or a binary file object, bytes like object or mmap to read it from.
+            Parsers that don't read from a file path can only be saved with save_as
+        :param fileinfo_data: Replace all fileinfo with this dict
+        :param plugin_data: Replace all plugin requirements with this dict
+        :param header_padding: Bytes of unused space to reserve in the header when the file is rewritten,
+            so later header edits can be saved in place without moving the scene content
+        :param file_obj: Already open binary file object of filename, the header is read from it instead of opening
+            the file again. The file object is not kept or closed
+        """
 
         self.log = logging.getLogger("maya_header_parser")
 
-        self.filename = filename
+        self.source = filename
+        self.filename = filename if file_utils.is_path(filename) else None
+        self.header_padding = header_padding
         self._header_data = {}
+        self._modified_sections = set()
+        self._section_copies = {}  # Copies of the sections the getters handed out, to find edits made to them directly
+        self._stream_tail = None  # Data read past the header from a stream that can't seek, see _copy_body
         self.header_parser = None
 
+        if fileinfo_data is not None:
+            self._modified_sections.add(self.FILEINFO_SECTION)
+
+        if plugin_data is not None:
+            self._modified_sections.add(self.PLUGIN_SECTION)
+
+    def _get_section(self, section) -> dict:
+        """ Get the {name: value} dict of a header section, files without any fileinfo/plugins get an empty one """
+        try:
+            return self._header_data[section]
+        except KeyError:
+            self._header_data[section] = {}
+            return self._header_data[section]
+
+    def _get_live_section(self, section):
+        """ Get a section to hand out to the caller, a copy is kept so edits made directly to it are found on save """
+        value = self._get_section(section)
+        if section not in self._section_copies:
+            self._section_copies[section] = copy.copy(value)
+        return value
+
+    def _get_live_section_names(self) -> dict:
+        """ {section: tracked section name} of the sections handed out by the getters """
+        return {self.FINF: self.FILEINFO_SECTION, self.PLUG: self.PLUGIN_SECTION}
+
+    def _get_directly_edited_sections(self) -> set:
+        """ Get the tracked names of the handed out sections that differ from their copy """
+        section_names = self._get_live_section_names()
+        return {
+            section_names[section] for section, section_copy in self._section_copies.items()
+            if self._header_data[section] != section_copy
+        }
+
+    def _mark_saved(self):
+        """ The header in memory is now the one in the file """
+        self._modified_sections.clear()
+        self._section_copies = {section: copy.copy(self._header_data[section]) for section in self._section_copies}
+
     def get_fileinfo(self, name: str, string_safe=True) -> str:
         """
         Get file info from given file
@@ -23,11 +173,9 @@ class ParserInterface(ABC):
             (the string will always be encapsulated in " in ascii files)
         :return: File info value
         """
-        value = self._header_data[self.FINF].get(name)
-        # Remove extra escape characters so we return same data that was sent in
+        value = self._get_section(self.FINF).get(name)
         if value and string_safe:
-            value = value.replace("\\\\", "\\")
-            value = value.replace("\\\"", "\"")
+            value = unescape_fileinfo(value)
 
         return value
 
@@ -50,27 +198,62 @@ class ParserInterface(ABC):
             value = value.replace("\\", "\\\\")
             value = value.replace("\"", "\\\"")
 
-        self._header_data[self.FINF][name] = value
+        if self._get_section(self.FINF).get(name) != value:
+            self._get_section(self.FINF)[name] = value
+            self._modified_sections.add(self.FILEINFO_SECTION)
 
     def remove_fileinfo(self, name: str):
-        if self._header_data[self.FINF].get(name):
-            self._header_data[self.FINF].pop(name)
+        if name in self._get_section(self.FINF):
+            self._get_section(self.FINF).pop(name)
+            self._modified_sections.add(self.FILEINFO_SECTION)
 
     def get_all_fileinfo(self) -> dict:
-        return self._header_data[self.FINF]
+        return self._get_live_section(self.FINF)
 
     def get_plugin(self, name: str) -> str:
-        return self._header_data[self.PLUG].get(name)
+        return self._get_section(self.PLUG).get(name)
 
     def set_plugin(self, name: str, value: str):
-        self._header_data[self.PLUG][name] = value
+        if self._get_section(self.PLUG).get(name) != value:
+            self._get_section(self.PLUG)[name] = value
+            self._modified_sections.add(self.PLUGIN_SECTION)
 
     def remove_plugin(self, name: str):
-        if self._header_data[self.PLUG].get(name):
-            self._header_data[self.PLUG].pop(name)
+        if name in self._get_section(self.PLUG):
+            self._get_section(self.PLUG).pop(name)
+            self._modified_sections.add(self.PLUGIN_SECTION)
 
     def get_all_plugins(self) -> dict:
-        return self._header_data[self.PLUG]
+        return self._get_live_section(self.PLUG)
+
+    def get_file_references(self) -> list:
+        """ Get the file reference commands stored in the header, only ascii files keep these in the header """
+        return []
+
+    def get_references(self) -> list:
+        """
+        Get the referenced files, nested references come right after their parent with a higher depth
+        :return: List of FileReference(path, namespace, reference_node, depth, file_type, deferred)
+        """
+        return []
+
+    @abstractmethod
+    def get_units(self) -> dict:
+        """
+        Get the scene units
+        :return: Dict with linear, angle and time unit, using the names stored in the file
+        """
+        return {}
+
+    @abstractmethod
+    def get_header_bytes(self) -> bytes:
+        """ Get the header as it was read from the file (or last saved), used to compare headers without parsing them """
+        return b""
+
+    @abstractmethod
+    def get_body_offset(self) -> int:
+        """ Get the byte offset where the scene content starts, everything before it is header """
+        return 0
 
     @abstractmethod
     def get_maya_version(self) -> int:
@@ -80,8 +263,68 @@ class ParserInterface(ABC):
     def set_maya_version(self, version: int):
         pass
 
-    def save(self):
-        self.save_as(self.filename)
+    def to_record(self):
+        """ Get a compact read only copy of the header values, see record.HeaderRecord """
+        from maya_header_parser import record
+        return record.HeaderRecord.from_parser(self)
+
+    def get_modified_sections(self) -> set:
+        """
+        Get the header sections that changed since the file was read or last saved.
+        Setters that write back the current value don't count as a change.
+        Edits made directly to the dicts returned by get_all_fileinfo/get_all_plugins (and the list returned by
+        get_file_references) are found by comparing them with a copy taken when they were first handed out.
+        :return: Set of FILEINFO_SECTION, PLUGIN_SECTION, VERSION_SECTION, UNITS_SECTION, REFERENCES_SECTION and PADDING_SECTION
+        """
+        return self._modified_sections | self._get_directly_edited_sections()
+
+    def is_modified(self) -> bool:
+        return bool(self.get_modified_sections())
+
+    def save(self, in_place=False, force=False) -> bool:
+        """
+        Save to current file, nothing is written if the header hasn't changed
+        :param in_place: Try to only overwrite the header in the current file, without rewriting the scene content.
+            Only the parts of the header that changed are written. Falls back to a full save if the new header doesn't fit in place
+        :param force: Save even if nothing has changed
+        :return: Whether the file was written
+        """
+        if self.filename is None:
+            raise ValueError("Header was read from a file object or buffer, use save_as to write it to a file")
+
+        if not force and not self.is_modified():
+            return False
+
+        if not (in_place and self._save_in_place()):
+            self.save_as(self.filename)
+
+        self._mark_saved()
+        return True
+
+    def _is_current_file(self, filename) -> bool:
+        """ Whether filename is the file the header was read from """
+        return self.filename is not None and os.path.abspath(filename) == os.path.abspath(self.filename)
+
+    def _copy_body(self, src_obj, dst_obj, body_offset: int):
+        """
+        Copy the scene content after the header to dst_obj.
+        A stream that can't seek (pipe, socket) is copied on from where reading the header stopped, so it can only be
+        copied once
+        """
+        if src_obj.seekable():
+            file_utils.copy_file_data(src_obj, dst_obj, body_offset)
+            return
+
+        if self._stream_tail is None:
+            raise ValueError("The scene content of a stream that can't seek can only be saved once")
+
+        dst_obj.write(self._stream_tail)
+        self._stream_tail = None
+        file_utils.copy_stream_data(src_obj, dst_obj)
+
+    def _save_in_place(self) -> bool:
+        """ Overwrite the changed parts of the header directly in the current file, returns False if it is not possible """
+        return False
 
     @abstractmethod
     def save_as(self, filename):
@@ -0,0 +1,144 @@
+"""
+Fast lookups of single header values, without building a full parser.
+Reading stops as soon as the answer is found, so only the start of the file is read most of the time.
+
+Example:
+    print(peek_version("C:/filepath/filename.mb"))
+    print(peek_fileinfo("C:/filepath/filename.ma", "Embark_info"))
+    print(peek_plugins("C:/filepath/filename.mb"))
+"""
+import math
+import struct
+import contextlib
+
+from maya_header_parser import parser, parser_interface, parser_ascii, parser_binary, metrics
+
+# Size of each read, the first read covers the VERS record and most of the time the whole HEAD chunk
+PEEK_READ_SIZE = 4 * 1024
+
+_RECORD_STRUCT = struct.Struct(">LxxxxQ")
+_PADDING_NAME = parser_binary.BinaryHeaderParser.PADDING_NAME.encode("utf-8") + b"\x00"
+
+
+@contextlib.contextmanager
+def _open_maya_file(filename):
+    """ Open the file and detect its format, yields (file_obj, is_binary) """
+    with metrics.open_file(filename, "rb") as file_obj:
+        file_format = parser.sniff_format(file_obj.read(parser.SNIFF_SIZE))
+        if file_format is None:
+            raise ValueError(f"Not a supported maya file {filename}")
+
+        file_obj.seek(0)
+        yield file_obj, file_format == parser.BINARY
+
+
+def _iter_binary_records(file_obj):
+    """ Yield (typeid, buffer, data_offset, data_length) for each HEAD record, only reading as much as needed """
+    buf = bytearray(file_obj.read(PEEK_READ_SIZE))
+
+    def ensure_size(size):
+        while len(buf) < size:
+            data = file_obj.read(max(size - len(buf), PEEK_READ_SIZE))
+            if not data:
+                return False
+            buf.extend(data)
+        return True
+
+    # Main chunk (FOR8 ... Maya) followed by the head chunk (FOR8 ... HEAD), see BinaryHeaderParser
+    head_offset = _RECORD_STRUCT.size + 4
+    data_offset = head_offset + _RECORD_STRUCT.size + 4
+    if len(buf) < data_offset or buf[:4] != b"FOR8" or buf[16:20] != b"Maya" or buf[36:40] != b"HEAD":
+        raise ValueError(f"Could not find maya info/header in {file_obj.name}")
+
+    data_end = head_offset + _RECORD_STRUCT.size + _RECORD_STRUCT.unpack_from(buf, head_offset)[1]
+    current_offset = data_offset
+    while current_offset + _RECORD_STRUCT.size <= data_end and ensure_size(current_offset + _RECORD_STRUCT.size):
+        typeid, data_length = _RECORD_STRUCT.unpack_from(buf, current_offset)
+        if typeid == parser_binary.BinaryHeaderParser.FOR8:
+            break
+
+        record_offset = current_offset + _RECORD_STRUCT.size
+        if not ensure_size(record_offset + data_length):
+            break
+
+        if not (typeid == parser_binary.BinaryHeaderParser.FINF and buf.startswith(_PADDING_NAME, record_offset)):
+            yield typeid, buf, record_offset, data_length
+
+        current_offset = math.ceil((record_offset + data_length) / 8) * 8
+
+
+def _iter_ascii_lines(file_obj):
+    """ Yield stripped header lines, stops at the end of the header """
+    for line in file_obj:
+        if line.startswith(b"createNode") or line.startswith(b"// End of"):
+            break
+        yield line.decode("utf-8", "surrogateescape").strip()
+
+
+def peek_version(filename) -> int:
+    """ Get the maya version, for binary files only the first HEAD record is decoded """
+    with _open_maya_file(filename) as (file_obj, is_binary):
+        if is_binary:
+            for typeid, buf, data_offset, data_length in _iter_binary_records(file_obj):
+                if typeid == parser_binary.BinaryHeaderParser.VERS:
+                    return int(parser_binary.unpack_record(buf, data_offset, data_length)[0])
+            return None
+
+        for line_data in _iter_ascii_lines(file_obj):
+            if line_data.startswith(parser_ascii.AsciiHeaderParser.REQUIRES):
+                variable, value = parser_ascii.unpack_requires_line(line_data)
+                if variable == "maya":
+                    return int(value)
+        return None
+
+
+def peek_fileinfo(filename, name: str, string_safe=True) -> str:
+    """
+    Get one file info value, same as ParserInterface.get_fileinfo
+    :param filename: Maya file to read
+    :param name: Name of file info
+    :param string_safe: Whether to replace \\"/\\\\ with "/\\ in the value
+    :return: File info value or None if it doesn't exist
+    """
+    value = None
+    with _open_maya_file(filename) as (file_obj, is_binary):
+        if is_binary:
+            encoded_name = name.encode("utf-8") + b"\x00"
+            for typeid, buf, data_offset, data_length in _iter_binary_records(file_obj):
+                if typeid == parser_binary.BinaryHeaderParser.FINF and buf.startswith(encoded_name, data_offset):
+                    value = parser_binary.unpack_record(buf, data_offset, data_length)[1]
+                    break
+        else:
+            prefix = f"{parser_ascii.AsciiHeaderParser.FINF}\"{name}\" "
+            for line_data in _iter_ascii_lines(file_obj):
+                if line_data.startswith(prefix):
+                    value = parser_ascii.unpack_fileinfo_line(line_data)[1]
+                    break
+
+    if value and string_safe:
+        value = parser_interface.unescape_fileinfo(value)
+    return value
+
+
+def peek_plugins(filename) -> dict:
+    """ Get all plugin requirements as {name: version} """
+    plugins = {}
+    with _open_maya_file(filename) as (file_obj, is_binary):
+        if is_binary:
+            for typeid, buf, data_offset, data_length in _iter_binary_records(file_obj):
+                if typeid == parser_binary.BinaryHeaderParser.PLUG:
+                    name, value = parser_binary.unpack_record(buf, data_offset, data_length)
+                    plugins[name] = value
+            return plugins
+
+        for line_data in _iter_ascii_lines(file_obj):
+            if line_data.startswith(parser_ascii.AsciiHeaderParser.REQUIRES):
+                variable, value = parser_ascii.unpack_requires_line(line_data)
+                if variable != "maya":
+                    plugins[variable] = value
+
+            # Maya always writes the requirements before units and fileinfo, nothing more to find after that
+            elif line_data.startswith((parser_ascii.AsciiHeaderParser.UNITS, parser_ascii.AsciiHeaderParser.FINF)):
+                break
+
+    return plugins
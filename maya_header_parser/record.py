@@ -0,0 +1,111 @@
+"""
+Compact read only snapshot of a parsed header, for keeping the headers of many files in memory.
+
+Example:
+    record = read_header_record("C:/filepath/filename.mb")
+    print(record.version, record.get_plugin("mtoa"), record.get_fileinfo("BuildId"))
+"""
+import sys
+
+from maya_header_parser import parser, parser_interface
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class HeaderRecord:
+    """
+    Immutable header values of one file.
+    Plugins and fileinfo are kept as flat tuples of names and values instead of dicts, and names, plugin versions and
+    units are interned, so the strings repeated across thousands of files are only stored once
+    """
+
+    __slots__ = ("path", "version", "units", "plugin_names", "plugin_versions", "fileinfo_names", "fileinfo_values")
+
+    UNIT_NAMES = ("linear", "angle", "time")
+
+    def __init__(self, path, version: int, units: dict, plugins: dict, fileinfo: dict):
+        """
+        :param path: Maya file the header was read from
+        :param version: Maya version
+        :param units: Dict with linear, angle and time unit, see ParserInterface.get_units
+        :param plugins: Plugin requirements as {name: version}
+        :param fileinfo: File info as {name: value}, values are stored as in the file (escaped)
+        """
+        set_slot = object.__setattr__
+        set_slot(self, "path", path)
+        set_slot(self, "version", version)
+        set_slot(self, "units", tuple(_intern(units.get(unit_name)) for unit_name in self.UNIT_NAMES))
+        set_slot(self, "plugin_names", tuple(sys.intern(name) for name in plugins))
+        set_slot(self, "plugin_versions", tuple(_intern(value) for value in plugins.values()))
+        set_slot(self, "fileinfo_names", tuple(sys.intern(name) for name in fileinfo))
+        set_slot(self, "fileinfo_values", tuple(fileinfo.values()))
+
+    @classmethod
+    def from_parser(cls, maya_file: parser_interface.ParserInterface):
+        return cls(
+            path=maya_file.filename,
+            version=maya_file.get_maya_version(),
+            units=maya_file.get_units(),
+            plugins=maya_file.get_all_plugins(),
+            fileinfo=maya_file.get_all_fileinfo(),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read only")
+
+    def __reduce__(self):
+        # The default pickling of slots sets the attributes one by one, which __setattr__ doesn't allow
+        return type(self), (self.path, self.version, self.get_units(), self.get_all_plugins(), self.get_all_fileinfo())
+
+    def __eq__(self, other):
+        if not isinstance(other, HeaderRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(path={self.path!r}, version={self.version!r}, plugins={len(self.plugin_names)}, fileinfo={len(self.fileinfo_names)})"
+
+    def get_fileinfo(self, name: str, string_safe=True) -> str:
+        """ Get a file info value or None, see ParserInterface.get_fileinfo """
+        try:
+            value = self.fileinfo_values[self.fileinfo_names.index(name)]
+        except ValueError:
+            return None
+
+        if value and string_safe:
+            value = parser_interface.unescape_fileinfo(value)
+        return value
+
+    def get_all_fileinfo(self) -> dict:
+        return dict(zip(self.fileinfo_names, self.fileinfo_values))
+
+    def get_plugin(self, name: str) -> str:
+        try:
+            return self.plugin_versions[self.plugin_names.index(name)]
+        except ValueError:
+            return None
+
+    def get_all_plugins(self) -> dict:
+        return dict(zip(self.plugin_names, self.plugin_versions))
+
+    def get_units(self) -> dict:
+        return {unit_name: unit for unit_name, unit in zip(self.UNIT_NAMES, self.units) if unit is not None}
+
+    def get_maya_version(self) -> int:
+        return self.version
+
+
+def read_header_record(source) -> HeaderRecord:
+    """
+    Parse a header and only keep the values, the parser and its buffers are dropped right away
+    :param source: File path, binary file object, bytes like object or mmap, see parser.maya_header_parser
+    """
+    return parser.open_maya_file(source).to_record()
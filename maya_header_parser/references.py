@@ -0,0 +1,195 @@
+"""
+Build a reference graph of a project from the file references in the scene headers, without opening maya.
+
+Example:
+    graph = build_reference_graph(["C:/project/scenes", "C:/project/assets"], workers=16)
+    print(graph.referenced_by("C:/project/assets/rig.ma"))        # Files that reference the rig directly
+    print(graph.all_referencing("C:/project/assets/rig.ma"))      # Every file that would be affected by a change
+    print(graph.find_cycles())
+"""
+import os
+import re
+import logging
+from collections import namedtuple
+
+from maya_header_parser import parser, scan
+
+log = logging.getLogger("maya_header_parser")
+
+# Maya adds {n} to the path when the same file is referenced more than once
+_COPY_NUMBER_PATTERN = re.compile(r"\{\d+\}$")
+
+ReferenceResult = namedtuple("ReferenceResult", ["path", "references", "error"])
+
+
+def read_references(path) -> ReferenceResult:
+    """ Read the references of one file, any error is returned in the result instead of raised """
+    try:
+        maya_file = parser.open_maya_file(path)
+
+        return ReferenceResult(path=path, references=maya_file.get_references(), error=None)
+    except Exception as error:
+        log.debug(f"Failed to read references {path}: {error}")
+        return ReferenceResult(path=path, references=None, error=error)
+
+
+def resolve_reference_path(path, referencing_file) -> str:
+    """
+    Turn a reference path into a normalized absolute path, so the same file referenced in different ways ends up
+    as one node. The copy number is removed, environment variables are expanded and relative paths are taken
+    relative to the referencing file
+    """
+    path = os.path.expandvars(_COPY_NUMBER_PATTERN.sub("", path))
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(referencing_file), path)
+    return os.path.normcase(os.path.normpath(path))
+
+
+def resolve_references(path, references, path_resolver=resolve_reference_path):
+    """
+    Resolve the paths of the references of a file, a reference at depth n belongs to the last reference seen at
+    depth n - 1 and its path is resolved relative to that parent
+    :param path: Resolved path of the file the references were read from
+    :param references: List of FileReference in the order they are stored, see ParserInterface.get_references
+    :param path_resolver: See ReferenceGraph
+    :return: Iterator of (resolved parent path, resolved reference path, depth)
+    """
+    parents = [path]
+    for reference in references:
+        if not reference.path:
+            continue
+
+        depth = max(1, min(reference.depth, len(parents)))
+        parent = parents[depth - 1]
+        referenced_path = path_resolver(reference.path, parent)
+        yield parent, referenced_path, depth
+        parents[depth:] = [referenced_path]
+
+
+class ReferenceGraph:
+    """
+    Directed graph of files and the files they reference.
+    Nested references found in a file header are added as edges of their parent reference, so the graph is
+    complete even for referenced files that were not scanned themselves
+    """
+
+    def __init__(self, path_resolver=resolve_reference_path):
+        """
+        :param path_resolver: Function (path, referencing_file) -> path used as node, maps the paths in the files to
+            one name per file, for example to map project roots or drive letters. Scanned files are passed as their own
+            referencing file
+        """
+        self.path_resolver = path_resolver
+        self.references = {}  # {path: set of referenced paths}
+        self.referencing = {}  # {path: set of paths that reference it}
+        self.errors = {}  # {path: error} of files that could not be read
+
+    def _node(self, path) -> str:
+        return self.path_resolver(path, path)
+
+    def add_edge(self, path, referenced_path):
+        self.references.setdefault(path, set()).add(referenced_path)
+        self.references.setdefault(referenced_path, set())
+        self.referencing.setdefault(referenced_path, set()).add(path)
+        self.referencing.setdefault(path, set())
+
+    def add_file(self, path, references):
+        """
+        Add a file and its references
+        :param path: Scanned file
+        :param references: List of FileReference in the order they are stored, see ParserInterface.get_references
+        """
+        path = self._node(path)
+        self.references.setdefault(path, set())
+        self.referencing.setdefault(path, set())
+
+        for parent, referenced_path, _ in resolve_references(path, references, self.path_resolver):
+            self.add_edge(parent, referenced_path)
+
+    def referenced_by(self, path) -> set:
+        """ Files that reference path directly """
+        return set(self.referencing.get(self._node(path), ()))
+
+    def references_of(self, path) -> set:
+        """ Files that path references directly """
+        return set(self.references.get(self._node(path), ()))
+
+    def all_referencing(self, path) -> set:
+        """ Every file that references path directly or through other references, the files a change to path affects """
+        return self._walk(self._node(path), self.referencing)
+
+    def all_references(self, path) -> set:
+        """ Every file that path needs to load, directly or through other references """
+        return self._walk(self._node(path), self.references)
+
+    def _walk(self, path, edges) -> set:
+        found = set()
+        stack = [path]
+        while stack:
+            for next_path in edges.get(stack.pop(), ()):
+                if next_path not in found:
+                    found.add(next_path)
+                    stack.append(next_path)
+        found.discard(path)
+        return found
+
+    def find_cycles(self) -> list:
+        """ Get reference cycles as lists of paths, where the last path references the first one """
+        cycles = []
+        finished = set()
+        for start in self.references:
+            if start in finished:
+                continue
+
+            # Iterative depth first search, stack holds (path, iterator over its references)
+            stack = [(start, iter(sorted(self.references[start])))]
+            on_stack = {start: 0}
+            while stack:
+                path, children = stack[-1]
+                for child in children:
+                    if child in on_stack:
+                        cycles.append([item[0] for item in stack[on_stack[child]:]])
+                    elif child not in finished:
+                        on_stack[child] = len(stack)
+                        stack.append((child, iter(sorted(self.references[child]))))
+                        break
+                else:
+                    stack.pop()
+                    del on_stack[path]
+                    finished.add(path)
+
+        return cycles
+
+    def topological_order(self) -> list:
+        """ Get all files ordered so every file comes after the files it references, raises ValueError on cycles """
+        reference_counts = {path: len(references) for path, references in self.references.items()}
+        ready = sorted(path for path, count in reference_counts.items() if not count)
+        order = []
+        while ready:
+            path = ready.pop()
+            order.append(path)
+            for referencing_path in self.referencing.get(path, ()):
+                reference_counts[referencing_path] -= 1
+                if not reference_counts[referencing_path]:
+                    ready.append(referencing_path)
+
+        if len(order) != len(reference_counts):
+            raise ValueError(f"Reference graph has cycles: {self.find_cycles()}")
+        return order
+
+
+def build_reference_graph(paths_or_roots, workers: int = None, executor="thread", path_resolver=resolve_reference_path) -> ReferenceGraph:
+    """
+    Scan all maya files in parallel and build a reference graph
+    :param paths_or_roots: File/directory path or a list of paths, see scan.iter_maya_files
+    :param workers: Number of worker threads/processes
+    :param executor: "thread" or "process"
+    :param path_resolver: See ReferenceGraph
+    """
+    graph = ReferenceGraph(path_resolver=path_resolver)
+    for result in scan.scan_headers(paths_or_roots, workers=workers, executor=executor, read_func=read_references):
+        if result.error:
+            graph.errors[result.path] = result.error
+        else:
+            graph.add_file(result.path, result.references)
+    return graph
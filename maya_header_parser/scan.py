@@ -0,0 +1,100 @@
+import os
+import re
+import logging
+from collections import namedtuple
+from concurrent import futures
+
+from maya_header_parser import parser
+
+log = logging.getLogger("maya_header_parser")
+
+# Files picked up when walking directories, the format is detected from the content so this also matches
+# versioned/renamed files like scene.mb.v012 and autosaves
+MAYA_FILENAME_PATTERN = re.compile(r"\.m[ab](\.|$)|\.autosave$", re.IGNORECASE)
+
+ScanResult = namedtuple("ScanResult", ["path", "version", "fileinfo", "plugins", "units", "error"])
+
+EXECUTORS = {
+    "thread": futures.ThreadPoolExecutor,
+    "process": futures.ProcessPoolExecutor,
+}
+
+
+def iter_maya_files(paths_or_roots):
+    """
+    Walk the given paths and yield all maya files, directories are walked lazily
+    :param paths_or_roots: File/directory path or a list of paths. Files are always included, directories are searched
+        recursively for files matching MAYA_FILENAME_PATTERN
+    """
+    if isinstance(paths_or_roots, (str, os.PathLike)):
+        paths_or_roots = [paths_or_roots]
+
+    for path in paths_or_roots:
+        path = os.fspath(path)
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, _, filenames in os.walk(path):
+            for filename in filenames:
+                if MAYA_FILENAME_PATTERN.search(filename):
+                    yield os.path.join(root, filename)
+
+
+def read_header(path) -> ScanResult:
+    """ Read the header of one file, any error is returned in the result instead of raised """
+    try:
+        maya_file = parser.open_maya_file(path)
+
+        return ScanResult(
+            path=path,
+            version=maya_file.get_maya_version(),
+            fileinfo=maya_file.get_all_fileinfo(),
+            plugins=maya_file.get_all_plugins(),
+            units=maya_file.get_units(),
+            error=None,
+        )
+    except Exception as error:
+        log.debug(f"Failed to read header {path}: {error}")
+        return ScanResult(path=path, version=None, fileinfo=None, plugins=None, units=None, error=error)
+
+
+def scan_headers(paths_or_roots, workers: int = None, executor="thread", max_pending: int = None, read_func=read_header):
+    """
+    Read headers of many files in parallel, results are yielded in the order they finish
+
+    Example:
+        for result in scan_headers(["C:/project/scenes"], workers=16):
+            if result.error:
+                print(result.path, result.error)
+            else:
+                print(result.path, result.version, result.plugins)
+
+    :param paths_or_roots: File/directory path or a list of paths, see iter_maya_files
+    :param workers: Number of worker threads/processes, defaults to the number of cpus
+    :param executor: "thread" or "process"
+    :param max_pending: Max number of files queued or being read at the same time, defaults to 4 per worker.
+        New files are only picked up when results have been consumed, so memory stays bounded on huge trees
+    :param read_func: Function that reads one path and returns the result, has to be picklable for the process executor
+    :return: Iterator of ScanResult(path, version, fileinfo, plugins, units, error)
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor {executor}, use one of {list(EXECUTORS)}")
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    pool = EXECUTORS[executor](max_workers=workers)
+    pending = set()
+    try:
+        for path in iter_maya_files(paths_or_roots):
+            pending.add(pool.submit(read_func, path))
+            if len(pending) >= max_pending:
+                done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        for future in futures.as_completed(pending):
+            yield future.result()
+    finally:
+        # Don't start on queued files if the caller stops iterating early
+        pool.shutdown(wait=True, cancel_futures=True)
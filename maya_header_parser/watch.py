@@ -0,0 +1,270 @@
+"""
+Keep header metadata up to date by watching project directories with Linux inotify, instead of rescanning them.
+Events are debounced per file, so the burst of writes and renames of one save only parses the file once, after it
+settled. Only the headers of changed files are read.
+
+Example:
+    def on_change(event):
+        print(event.path, "removed" if event.result is None else event.result.version)
+
+    with HeaderWatcher(["/project/scenes"], callback=on_change) as watcher:
+        watcher.run()
+
+    # Or keep a header index current, run() has to be called from the thread that opened the index
+    with index.HeaderIndex("/project/header_index.db") as header_index, HeaderWatcher(["/project/scenes"], index=header_index) as watcher:
+        watcher.run()
+"""
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from collections import namedtuple
+
+from maya_header_parser import scan, cache
+from maya_header_parser.index import read_index_entry
+
+log = logging.getLogger("maya_header_parser")
+
+# Seconds a file has to be quiet before it's parsed
+DEFAULT_DEBOUNCE = 1.0
+
+# inotify flags, see man inotify
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+_EVENT_STRUCT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+# result is None when the file was removed
+WatchEvent = namedtuple("WatchEvent", ["path", "result"])
+
+
+class Inotify:
+    """ Minimal inotify binding through ctypes, raises OSError on platforms without inotify """
+
+    def __init__(self):
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self._libc.inotify_init1
+        except (OSError, AttributeError):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise_errno("inotify_init1")
+
+    def _raise_errno(self, name, path=None):
+        error_number = ctypes.get_errno()
+        raise OSError(error_number, f"{name} failed: {os.strerror(error_number)}", path)
+
+    def add_watch(self, path, mask=WATCH_MASK) -> int:
+        watch_descriptor = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if watch_descriptor < 0:
+            self._raise_errno("inotify_add_watch", path)
+        return watch_descriptor
+
+    def read_events(self, timeout: float = None) -> list:
+        """ Wait up to timeout seconds for events, returns a list of (watch descriptor, mask, cookie, name) """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_STRUCT.size <= len(data):
+            watch_descriptor, mask, cookie, name_length = _EVENT_STRUCT.unpack_from(data, offset)
+            offset += _EVENT_STRUCT.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b"\x00"))
+            offset += name_length
+            events.append((watch_descriptor, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class HeaderWatcher:
+    """
+    Watch directory trees for maya files that are written, renamed or removed, and publish their new headers
+    to a callback and/or a HeaderIndex
+    """
+
+    def __init__(self, roots, callback=None, index=None, debounce: float = DEFAULT_DEBOUNCE, workers: int = None,
+                 read_func=None):
+        """
+        :param roots: Directory or list of directories to watch recursively
+        :param callback: Called with WatchEvent(path, result) for every changed file, result is the return value of
+            read_func or None if the file was removed
+        :param index: HeaderIndex to update with the changed files, only the changed files are looked up in it
+        :param debounce: Seconds a file has to be quiet before it's parsed
+        :param workers: Number of threads used to parse a batch of changed files
+        :param read_func: Function that reads one path, see scan.scan_headers. Defaults to scan.read_header, or with
+            an index to index.read_index_entry so every file is only read once, the callback then gets the IndexEntry.
+            A different read_func together with an index reads the files twice
+        """
+        if isinstance(roots, (str, os.PathLike)):
+            roots = [roots]
+
+        self.roots = [os.path.abspath(os.fspath(root)) for root in roots]
+        self.callback = callback
+        self.index = index
+        self.debounce = debounce
+        self.workers = workers
+        self.read_func = read_func or (scan.read_header if index is None else read_index_entry)
+
+        self._inotify = Inotify()
+        self._directories = {}  # {watch descriptor: directory}
+        self._pending = {}  # {path: [time of the last event, whether the file existed before the first event]}
+
+        for root in self.roots:
+            self._watch_tree(root, mark_files=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._inotify.close()
+
+    def _watch_tree(self, root, mark_files=True):
+        """ Watch a directory and everything below it, files already in a new directory are marked as changed """
+        for directory, _, filenames in os.walk(root):
+            try:
+                self._directories[self._inotify.add_watch(directory)] = directory
+            except OSError as error:
+                log.warning(f"Can't watch {directory}: {error}")
+                continue
+
+            if mark_files:
+                for filename in filenames:
+                    if scan.MAYA_FILENAME_PATTERN.search(filename):
+                        self._mark(os.path.join(directory, filename), existed=False)
+
+    def _mark(self, path, existed=True):
+        now = time.monotonic()
+        if path in self._pending:
+            self._pending[path][0] = now
+        else:
+            self._pending[path] = [now, existed]
+
+    def _handle_event(self, watch_descriptor, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            log.warning("inotify queue overflowed, events were lost, rescanning the watched directories")
+            for path in scan.iter_maya_files(self.roots):
+                self._mark(path)
+            return
+
+        directory = self._directories.get(watch_descriptor)
+        if directory is None:
+            return
+
+        if mask & IN_IGNORED:
+            # The directory was removed or moved away, the kernel dropped the watch
+            del self._directories[watch_descriptor]
+            return
+
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+            return
+
+        if not name or not scan.MAYA_FILENAME_PATTERN.search(name):
+            return
+
+        # Files that show up during the debounce time and are gone again (temporary files) are never published
+        self._mark(path, existed=not mask & (IN_CREATE | IN_MOVED_TO))
+
+    def _take_settled_paths(self) -> tuple:
+        """ Remove the paths that were quiet for the debounce time from the pending list, returns (changed, removed) """
+        now = time.monotonic()
+        changed = []
+        removed = []
+        for path, (last_event, existed) in list(self._pending.items()):
+            if now - last_event < self.debounce:
+                continue
+
+            del self._pending[path]
+            if os.path.isfile(path):
+                changed.append(path)
+            elif existed:
+                removed.append(path)
+
+        return changed, removed
+
+    def _publish(self, changed, removed) -> tuple:
+        """ Read the changed files and hand them to the callback and index, returns the (changed, removed) published """
+        for path in changed + removed:
+            cache.invalidate(path)
+
+        if self.index is not None:
+            # Files that were touched without changing, or all files after a queue overflow, aren't read again
+            changed = [path for path in changed if not self.index.is_current(path)]
+
+        results = list(scan.scan_headers(changed, workers=self.workers, read_func=self.read_func)) if changed else []
+        reads_index_entries = self.read_func is read_index_entry
+
+        if self.index is not None:
+            entries = results if reads_index_entries else scan.scan_headers(changed, workers=self.workers, read_func=read_index_entry)
+            self.index.update_files(entries, removed)
+
+        if self.callback is not None:
+            for path in removed:
+                self.callback(WatchEvent(path=path, result=None))
+            for result in results:
+                if reads_index_entries:
+                    result = result[1]
+                self.callback(WatchEvent(path=getattr(result, "path", None), result=result))
+
+        return changed, removed
+
+    def poll(self, timeout: float = None) -> tuple:
+        """
+        Handle the events that arrive within timeout seconds and publish the files that settled
+        :return: (changed paths, removed paths) that were published
+        """
+        if self._pending:
+            # Wake up in time to publish the next file that settles
+            next_settle = min(last_event for last_event, _ in self._pending.values()) + self.debounce - time.monotonic()
+            timeout = max(0.0, next_settle) if timeout is None else max(0.0, min(timeout, next_settle))
+
+        for watch_descriptor, mask, _, name in self._inotify.read_events(timeout):
+            self._handle_event(watch_descriptor, mask, name)
+
+        changed, removed = self._take_settled_paths()
+        if changed or removed:
+            changed, removed = self._publish(changed, removed)
+        return changed, removed
+
+    def run(self, stop_event=None, poll_interval: float = 1.0):
+        """
+        Watch until stop_event (a threading.Event) is set, or forever
+        :param poll_interval: Max seconds between checks of stop_event
+        """
+        while stop_event is None or not stop_event.is_set():
+            self.poll(poll_interval)
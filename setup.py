@@ -13,8 +13,13 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/ChrilleMZ/maya-header-parser",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*", "tests", "tests.*"]),
     package_data={'': ['*.*']},
+    entry_points={
+        "console_scripts": [
+            "maya-header-edit=maya_header_parser.batch_edit:main",
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,108 @@
+"""
+Batch edits: files that already match are skipped, and a job can be resumed from its journal.
+"""
+import os
+import json
+
+import pytest
+
+from benchmarks import generate
+from maya_header_parser import parser, batch_edit, file_utils
+
+OPERATIONS = [("set_plugin", ("newPlugin", "2.0")), ("set_fileinfo", ("BuildId", "1234"))]
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    directory = tmp_path / "scenes"
+    directory.mkdir()
+    filenames = []
+    for name in ("a.mb", "b.ma", "c.mb"):
+        filename = str(directory / name)
+        generate.write_scene(filename, fileinfo_count=5, plugin_count=2, body_size=4096)
+        filenames.append(filename)
+    return filenames
+
+
+def read_bytes(filename) -> bytes:
+    with open(filename, "rb") as file_obj:
+        return file_obj.read()
+
+
+def test_batch_edit(scenes):
+    results = {result.path: result for result in batch_edit.batch_edit(scenes, OPERATIONS, workers=2)}
+
+    assert {result.status for result in results.values()} == {batch_edit.DONE}
+    for filename in scenes:
+        maya_file = parser.maya_header_parser(filename)
+        assert maya_file.get_plugin("newPlugin") == "2.0"
+        assert maya_file.get_fileinfo("BuildId") == "1234"
+
+
+def test_files_that_match_are_skipped(scenes):
+    list(batch_edit.batch_edit(scenes, OPERATIONS))
+    data = {filename: read_bytes(filename) for filename in scenes}
+    inodes = {filename: os.stat(filename).st_ino for filename in scenes}
+
+    results = list(batch_edit.batch_edit(scenes, OPERATIONS))
+
+    assert {result.status for result in results} == {batch_edit.SKIPPED}
+    for filename in scenes:
+        assert read_bytes(filename) == data[filename]
+        assert os.stat(filename).st_ino == inodes[filename]
+
+
+def test_resume_from_journal(scenes, tmp_path):
+    journal = str(tmp_path / "job.jsonl")
+    done_file, started_file, new_file = scenes
+
+    # An earlier run finished the first file and died while editing the second one
+    with open(journal, "w") as file_obj:
+        file_obj.write(json.dumps({"operations": [list(operation) for operation in batch_edit.validate_operations(OPERATIONS)]}) + "\n")
+        file_obj.write(json.dumps({"path": done_file, "status": batch_edit.DONE, "error": None}) + "\n")
+        file_obj.write(json.dumps({"path": started_file, "status": batch_edit.STARTED}) + "\n")
+        file_obj.write('{"path": "cut sh')
+
+    results = {result.path: result.status for result in batch_edit.batch_edit(scenes, OPERATIONS, journal=journal)}
+
+    assert results == {started_file: batch_edit.DONE, new_file: batch_edit.DONE}
+    assert parser.maya_header_parser(done_file).get_plugin("newPlugin") is None
+    assert parser.maya_header_parser(started_file).get_plugin("newPlugin") == "2.0"
+
+    # Everything is finished now, running again doesn't touch any file
+    assert list(batch_edit.batch_edit(scenes, OPERATIONS, journal=journal)) == []
+
+
+def test_retry_failed(scenes, tmp_path):
+    journal = str(tmp_path / "job.jsonl")
+    broken_file = str(tmp_path / "scenes" / "broken.ma")
+    with open(broken_file, "wb") as file_obj:
+        file_obj.write(b"not a maya file")
+
+    results = {result.path: result.status for result in batch_edit.batch_edit([broken_file], OPERATIONS, journal=journal)}
+    assert results == {broken_file: batch_edit.FAILED}
+
+    assert list(batch_edit.batch_edit([broken_file], OPERATIONS, journal=journal)) == []
+    results = list(batch_edit.batch_edit([broken_file], OPERATIONS, journal=journal, retry_failed=True))
+    assert [result.status for result in results] == [batch_edit.FAILED]
+
+
+def test_journal_for_other_operations(scenes, tmp_path):
+    journal = str(tmp_path / "job.jsonl")
+    list(batch_edit.batch_edit(scenes[:1], OPERATIONS, journal=journal))
+
+    with pytest.raises(ValueError):
+        list(batch_edit.batch_edit(scenes, [("set_plugin", ("newPlugin", "3.0"))], journal=journal))
+    assert parser.maya_header_parser(scenes[1]).get_plugin("newPlugin") is None
+
+
+def test_interrupted_job_leaves_files_untouched(scenes, monkeypatch):
+    data = read_bytes(scenes[0])
+
+    def fail(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(file_utils, "copy_file_data", fail)
+    with pytest.raises(KeyboardInterrupt):
+        batch_edit.apply_edits(scenes[0], batch_edit.validate_operations(OPERATIONS))
+    assert read_bytes(scenes[0]) == data
@@ -0,0 +1,118 @@
+"""
+Header diffs and three-way merges of concurrent header edits.
+"""
+import os
+import shutil
+
+import pytest
+
+from benchmarks import generate
+from maya_header_parser import parser, diff
+
+
+@pytest.fixture(params=[".mb", ".ma"])
+def base(request, tmp_path):
+    filename = str(tmp_path / f"base{request.param}")
+    generate.write_scene(filename, fileinfo_count=5, plugin_count=2, body_size=4096)
+    return filename
+
+
+def edited_copy(base, name, *edits):
+    """ Copy base and apply (method, args) edits to the copy """
+    filename = os.path.join(os.path.dirname(base), name + os.path.splitext(base)[1])
+    shutil.copy(base, filename)
+    maya_file = parser.maya_header_parser(filename)
+    for method, args in edits:
+        getattr(maya_file, method)(*args)
+    maya_file.save()
+    return filename
+
+
+def test_identical_headers_are_not_decoded(base):
+    old_file = parser.maya_header_parser(base)
+    new_file = parser.maya_header_parser(edited_copy(base, "copy"))
+
+    def fail():
+        raise AssertionError("Identical headers were decoded")
+
+    for maya_file in (old_file, new_file):
+        maya_file.get_all_fileinfo = maya_file.get_all_plugins = maya_file.get_units = fail
+
+    assert diff.diff_headers(old_file, new_file) == []
+
+
+def test_diff_headers(base):
+    new = edited_copy(base, "new", ("set_fileinfo", ("key", "value")), ("remove_fileinfo", ("info_000000",)),
+                      ("set_plugin", ("plugin_0001", "2.0")), ("set_maya_version", (2024,)))
+
+    changes = diff.diff_headers(base, new)
+
+    assert sorted(changes, key=str) == sorted([
+        diff.HeaderChange(diff.VERSION, None, 2022, 2024),
+        diff.HeaderChange(diff.FILEINFO, "key", None, "value"),
+        diff.HeaderChange(diff.FILEINFO, "info_000000", parser.maya_header_parser(base).get_fileinfo("info_000000"), None),
+        diff.HeaderChange(diff.PLUGINS, "plugin_0001", "1.0.0", "2.0"),
+    ], key=str)
+
+
+def test_merge_without_conflicts(base):
+    ours = edited_copy(base, "ours", ("set_fileinfo", ("ours", "1")), ("set_plugin", ("newPlugin", "1.0")))
+    theirs = edited_copy(base, "theirs", ("set_fileinfo", ("theirs", "1")), ("set_plugin", ("newPlugin", "1.0")),
+                         ("remove_fileinfo", ("info_000001",)))
+
+    result = diff.merge_headers(base, ours, theirs)
+
+    assert result.conflicts == []
+    # The plugin was added on both sides, only the changes that ours doesn't have yet are applied
+    assert sorted((change.section, change.name) for change in result.applied) == [
+        (diff.FILEINFO, "info_000001"), (diff.FILEINFO, "theirs")
+    ]
+    assert result.maya_file.save()
+
+    merged_file = parser.maya_header_parser(ours)
+    assert merged_file.get_fileinfo("ours") == "1"
+    assert merged_file.get_fileinfo("theirs") == "1"
+    assert merged_file.get_fileinfo("info_000001") is None
+    assert merged_file.get_plugin("newPlugin") == "1.0"
+
+
+@pytest.mark.parametrize("prefer, expected_value, expected_conflicts", [
+    (None, "ours", 1),
+    ("ours", "ours", 0),
+    ("theirs", "theirs", 0),
+])
+def test_merge_conflict(base, prefer, expected_value, expected_conflicts):
+    ours = edited_copy(base, "ours", ("set_fileinfo", ("info_000002", "ours")))
+    theirs = edited_copy(base, "theirs", ("set_fileinfo", ("info_000002", "theirs")), ("set_fileinfo", ("other", "1")))
+
+    result = diff.merge_headers(base, ours, theirs, prefer=prefer)
+
+    assert result.maya_file.get_fileinfo("info_000002") == expected_value
+    assert result.maya_file.get_fileinfo("other") == "1"
+    assert len(result.conflicts) == expected_conflicts
+    if expected_conflicts:
+        base_value = parser.maya_header_parser(base).get_fileinfo("info_000002")
+        assert result.conflicts == [diff.HeaderConflict(diff.FILEINFO, "info_000002", base_value, "ours", "theirs")]
+
+
+def test_merge_unknown_prefer(base):
+    with pytest.raises(ValueError):
+        diff.merge_headers(base, base, base, prefer="newest")
+
+
+def test_merge_units_conflict(tmp_path):
+    base = str(tmp_path / "base.ma")
+    generate.write_scene(base, body_size=4096)
+    ours = edited_copy(base, "ours", ("set_fileinfo", ("ours", "1")))
+    theirs = str(tmp_path / "theirs.ma")
+    with open(base, "rb") as file_obj:
+        data = file_obj.read()
+    with open(theirs, "wb") as file_obj:
+        file_obj.write(data.replace(b"currentUnit -l centimeter", b"currentUnit -l meter"))
+
+    result = diff.merge_headers(base, ours, theirs, prefer="theirs")
+
+    # Units can't be written, the change is reported even when theirs is preferred
+    assert result.applied == []
+    assert result.conflicts == [diff.HeaderConflict(diff.UNITS, "linear", "centimeter", "centimeter", "meter")]
+    assert result.maya_file.get_units()["linear"] == "centimeter"
@@ -0,0 +1,122 @@
+"""
+Header index: refreshing only parses changed files, removed files are dropped and references can be queried.
+"""
+import os
+import shutil
+
+import pytest
+
+from benchmarks import generate
+from maya_header_parser import index
+
+
+@pytest.fixture
+def project(tmp_path):
+    directory = tmp_path / "scenes"
+    directory.mkdir()
+    generate.write_scene(str(directory / "rig.ma"), body_size=4096)
+    generate.write_scene(str(directory / "set.mb"), references=[("rig.ma", 1)], body_size=4096)
+    generate.write_scene(str(directory / "shot.ma"), references=[("set.mb", 1), ("rig.ma", 2)], body_size=4096)
+    return str(directory)
+
+
+@pytest.fixture
+def header_index(tmp_path):
+    with index.HeaderIndex(str(tmp_path / "index.db")) as header_index:
+        yield header_index
+
+
+def test_refresh_only_parses_changed_files(project, header_index):
+    assert header_index.refresh(project) == index.RefreshStats(parsed=3, unchanged=0, removed=0, failed=0)
+    assert header_index.refresh(project) == index.RefreshStats(parsed=0, unchanged=3, removed=0, failed=0)
+
+    rig = os.path.join(project, "rig.ma")
+    assert header_index.get(rig).version == 2022
+    assert header_index.is_current(rig)
+
+
+def test_refresh_after_size_change(project, header_index):
+    header_index.refresh(project)
+    rig = os.path.join(project, "rig.ma")
+    generate.write_scene(rig, maya_version=2024, body_size=8192)
+
+    assert not header_index.is_current(rig)
+    assert header_index.refresh(project).parsed == 1
+    assert header_index.get(rig).version == 2024
+
+
+def test_refresh_after_mtime_change(project, header_index):
+    header_index.refresh(project)
+    rig = os.path.join(project, "rig.ma")
+    stat = os.stat(rig)
+    os.utime(rig, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+    assert header_index.refresh(project).parsed == 1
+
+
+def test_refresh_after_inode_change(project, header_index):
+    header_index.refresh(project)
+    rig = os.path.join(project, "rig.ma")
+    stat = os.stat(rig)
+
+    # Replaced by a file with the same size and mtime, like a restore from a backup
+    generate.write_scene(rig + ".tmp", maya_version=2024, body_size=4096)
+    os.utime(rig + ".tmp", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(rig + ".tmp", rig)
+    assert os.stat(rig).st_size == stat.st_size and os.stat(rig).st_ino != stat.st_ino
+
+    assert header_index.refresh(project).parsed == 1
+    assert header_index.get(rig).version == 2024
+
+
+def test_refresh_removes_missing_files(project, header_index, tmp_path):
+    header_index.refresh(project)
+    rig = os.path.join(project, "rig.ma")
+    os.remove(rig)
+
+    # Files outside the refreshed paths are kept
+    other_directory = str(tmp_path / "other")
+    os.mkdir(other_directory)
+    shutil.copy(os.path.join(project, "set.mb"), other_directory)
+    header_index.refresh(other_directory)
+
+    assert header_index.refresh(project, remove_missing=False).removed == 0
+    assert header_index.get(rig) is not None
+    assert header_index.refresh(project) == index.RefreshStats(parsed=0, unchanged=2, removed=1, failed=0)
+    assert header_index.get(rig) is None
+    assert header_index.get(os.path.join(other_directory, "set.mb")) is not None
+
+
+def test_files_referencing(project, header_index):
+    header_index.refresh(project)
+    rig = os.path.join(project, "rig.ma")
+    set_file = os.path.join(project, "set.mb")
+    shot = os.path.join(project, "shot.ma")
+
+    assert header_index.files_referencing(rig) == [set_file]
+    assert header_index.files_referencing(rig, include_nested=True) == sorted([set_file, shot])
+    assert header_index.files_referencing(set_file) == [shot]
+    assert [(reference.path, reference.depth) for reference in header_index.get(shot).file_references] == [(set_file, 1), (rig, 2)]
+
+
+def test_update_files(project, header_index):
+    header_index.refresh(project)
+    rig = os.path.join(project, "rig.ma")
+    shot = os.path.join(project, "shot.ma")
+    generate.write_scene(rig, maya_version=2024, body_size=8192)
+    os.remove(shot)
+
+    stats = header_index.update_files([index.read_index_entry(rig), index.read_index_entry(os.path.join(project, "set.mb"))], [shot])
+    assert stats == index.RefreshStats(parsed=1, unchanged=1, removed=1, failed=0)
+    assert header_index.get(rig).version == 2024
+    assert header_index.get(shot) is None
+
+
+def test_old_schema_is_rebuilt(project, tmp_path):
+    database = str(tmp_path / "old.db")
+    with index.HeaderIndex(database) as header_index:
+        header_index.refresh(project)
+        header_index.connection.execute("PRAGMA user_version = 1")
+
+    with index.HeaderIndex(database) as header_index:
+        assert header_index.refresh(project).parsed == 3
@@ -0,0 +1,109 @@
+"""
+File references read from .ma/.mb headers and the reference graph built from them.
+"""
+import os
+
+import pytest
+
+from benchmarks import generate
+from maya_header_parser import parser, references
+from maya_header_parser.parser_interface import FileReference
+
+# Nested references follow their parent with a higher depth
+NESTED_REFERENCES = [
+    ("/project/assets/set.ma", 1),
+    ("/project/assets/prop.ma", 2),
+    ("/project/assets/texture_rig.ma", 3),
+    ("/project/assets/char.ma", 1),
+]
+
+
+@pytest.fixture(params=[".mb", ".ma"])
+def scene(request, tmp_path):
+    filename = str(tmp_path / f"scene{request.param}")
+    generate.write_scene(filename, references=NESTED_REFERENCES, body_size=4096)
+    return filename
+
+
+def reference(path, depth=1) -> FileReference:
+    return FileReference(path=path, namespace=None, reference_node=None, depth=depth, file_type=None, deferred=False)
+
+
+def test_get_references(scene):
+    file_references = parser.maya_header_parser(scene).get_references()
+
+    assert [(item.path, item.depth) for item in file_references] == NESTED_REFERENCES
+    assert [item.namespace for item in file_references] == [f"asset_{index:06d}" for index in range(len(NESTED_REFERENCES))]
+    # The top level references are deferred in their -r line / FREF chunk
+    assert [item.deferred for item in file_references] == [True, False, False, True]
+
+
+def test_binary_references_without_depth_info(tmp_path):
+    filename = str(tmp_path / "scene.mb")
+    generate.write_scene(filename, body_size=4096)
+    with open(filename, "rb") as file_obj:
+        data = file_obj.read()
+
+    # Positional FRDI/FREF data after the HEAD chunk, followed by an unknown data chunk before the nodes
+    maya_file = parser.maya_header_parser(filename)
+    content_offset = maya_file.get_body_offset()
+    chunks = b"".join(generate._pack_record(typeid, value) for typeid, value in (
+        (b"FRDI", b"1\x00/project/a.ma\x00"),
+        (b"FRDI", b"2\x00/project/b.ma\x00"),
+        (b"FREF", b"/project/a.ma\x00"),
+        (b"UNKN", b"data"),
+    ))
+    main_length = int.from_bytes(data[8:16], "big") + len(chunks)
+    data = data[:8] + main_length.to_bytes(8, "big") + data[16:content_offset] + chunks + data[content_offset:]
+    with open(filename, "wb") as file_obj:
+        file_obj.write(data)
+
+    file_references = parser.maya_header_parser(filename).get_references()
+    assert [(item.path, item.depth) for item in file_references] == [("/project/a.ma", 1), ("/project/b.ma", 2)]
+
+
+def test_add_file_depth():
+    graph = references.ReferenceGraph(path_resolver=lambda path, referencing_file: path)
+    graph.add_file("shot", [reference(path, depth) for path, depth in NESTED_REFERENCES])
+
+    assert graph.references_of("shot") == {"/project/assets/set.ma", "/project/assets/char.ma"}
+    assert graph.references_of("/project/assets/set.ma") == {"/project/assets/prop.ma"}
+    assert graph.references_of("/project/assets/prop.ma") == {"/project/assets/texture_rig.ma"}
+    assert graph.all_referencing("/project/assets/texture_rig.ma") == {"shot", "/project/assets/set.ma", "/project/assets/prop.ma"}
+
+
+def test_add_file_depth_out_of_range():
+    graph = references.ReferenceGraph(path_resolver=lambda path, referencing_file: path)
+    # A depth that skips a level belongs to the deepest parent so far, a depth below 1 is a top level reference
+    graph.add_file("shot", [reference("a", 1), reference("b", 3), reference("c", 0), reference(None), reference("d", 2)])
+
+    assert graph.references_of("shot") == {"a", "c"}
+    assert graph.references_of("a") == {"b"}
+    assert graph.references_of("c") == {"d"}
+
+
+def test_find_cycles(tmp_path):
+    for name, referenced_name in (("a.mb", "b.ma"), ("b.ma", "c.mb"), ("c.mb", "a.mb"), ("d.ma", "a.mb")):
+        generate.write_scene(str(tmp_path / name), references=[(referenced_name, 1)], body_size=4096)
+
+    graph = references.build_reference_graph([str(tmp_path)], workers=2)
+
+    assert not graph.errors
+    cycles = graph.find_cycles()
+    assert len(cycles) == 1
+    cycle_names = [os.path.basename(path) for path in cycles[0]]
+    assert sorted(cycle_names) == ["a.mb", "b.ma", "c.mb"]
+    assert cycle_names[(cycle_names.index("a.mb") + 1) % 3] == "b.ma"
+    with pytest.raises(ValueError):
+        graph.topological_order()
+
+
+def test_topological_order(tmp_path):
+    graph = references.ReferenceGraph(path_resolver=lambda path, referencing_file: path)
+    graph.add_file("shot", [reference("set", 1), reference("prop", 2), reference("char", 1)])
+    graph.add_file("char", [reference("prop", 1)])
+
+    assert graph.find_cycles() == []
+    order = graph.topological_order()
+    assert order.index("prop") < order.index("set") < order.index("shot")
+    assert order.index("char") < order.index("shot")
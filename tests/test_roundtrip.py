@@ -0,0 +1,238 @@
+"""
+Save -> parse again -> compare round trips for the writers that change files: full rewrites, in place saves and
+header splicing. The scene content after the header has to come out byte for byte the same every time.
+"""
+import io
+import os
+import errno
+import codecs
+import threading
+import time
+
+import pytest
+
+from benchmarks import generate
+from maya_header_parser import parser, file_utils
+
+BODY_SIZE = 256 * 1024
+
+
+@pytest.fixture(params=[".mb", ".ma"])
+def scene(request, tmp_path):
+    filename = str(tmp_path / f"scene{request.param}")
+    generate.write_scene(filename, fileinfo_count=20, plugin_count=3, body_size=BODY_SIZE)
+    return filename
+
+
+def read_body(filename) -> bytes:
+    with open(filename, "rb") as file_obj:
+        data = file_obj.read()
+    return data[parser.maya_header_parser(filename).get_body_offset():]
+
+
+def read_bytes(filename) -> bytes:
+    with open(filename, "rb") as file_obj:
+        return file_obj.read()
+
+
+def test_save_keeps_body(scene):
+    body = read_body(scene)
+    maya_file = parser.maya_header_parser(scene)
+    maya_file.set_fileinfo("key", "value")
+    maya_file.remove_fileinfo("info_000000")
+    maya_file.set_plugin("newPlugin", "1.0")
+
+    assert maya_file.save()
+    saved_file = parser.maya_header_parser(scene)
+    assert saved_file.get_fileinfo("key") == "value"
+    assert saved_file.get_fileinfo("info_000000") is None
+    assert saved_file.get_plugin("newPlugin") == "1.0"
+    assert read_body(scene) == body
+
+
+def test_save_without_changes_doesnt_write(scene):
+    data = read_bytes(scene)
+    assert not parser.maya_header_parser(scene).save()
+    assert read_bytes(scene) == data
+
+
+def test_in_place_fits(scene):
+    body = read_body(scene)
+    parser.maya_header_parser(scene, header_padding=1024).save()
+    size = os.path.getsize(scene)
+    inode = os.stat(scene).st_ino
+
+    maya_file = parser.maya_header_parser(scene)
+    maya_file.set_fileinfo("key", "value")
+    assert maya_file.save(in_place=True)
+
+    assert os.stat(scene).st_ino == inode
+    assert os.path.getsize(scene) == size
+    assert parser.maya_header_parser(scene).get_fileinfo("key") == "value"
+    assert read_body(scene) == body
+
+
+def test_in_place_no_fit(scene):
+    body = read_body(scene)
+    maya_file = parser.maya_header_parser(scene)
+    maya_file.set_fileinfo("key", "x" * 4096)
+    assert maya_file.save(in_place=True)
+
+    assert parser.maya_header_parser(scene).get_fileinfo("key") == "x" * 4096
+    assert read_body(scene) == body
+
+
+def test_in_place_after_file_changed_on_disk(scene):
+    body = read_body(scene)
+    parser.maya_header_parser(scene, header_padding=2048).save()
+    maya_file = parser.maya_header_parser(scene)
+
+    # Another tool rewrites the file with a smaller header
+    other_file = parser.maya_header_parser(scene)
+    for name in list(other_file.get_all_fileinfo()):
+        other_file.remove_fileinfo(name)
+    other_file.save()
+
+    maya_file.set_fileinfo("key", "value")
+    assert maya_file.save(in_place=True)
+
+    saved_file = parser.maya_header_parser(scene)
+    assert saved_file.get_fileinfo("key") == "value"
+    assert read_body(scene) == body
+    if scene.endswith(".mb"):
+        assert sum(chunk.data_length for chunk in saved_file.iter_body_chunks()) > 0
+
+
+def test_in_place_after_same_size_header_change_on_disk(scene):
+    body = read_body(scene)
+    parser.maya_header_parser(scene, header_padding=2048).save()
+    maya_file = parser.maya_header_parser(scene)
+    size = os.path.getsize(scene)
+
+    # Another tool edits the header in place, the padding keeps the header size the same
+    other_file = parser.maya_header_parser(scene)
+    other_file.set_fileinfo("info_000000", "x")
+    assert other_file.save(in_place=True)
+    assert os.path.getsize(scene) == size
+
+    maya_file.set_fileinfo("info_000019", "value")
+    assert maya_file.save(in_place=True)
+
+    saved_file = parser.maya_header_parser(scene)
+    assert saved_file.get_all_fileinfo() == maya_file.get_all_fileinfo()
+    assert read_body(scene) == body
+
+
+def test_direct_dict_edits_are_saved(scene):
+    maya_file = parser.maya_header_parser(scene)
+    maya_file.get_all_fileinfo()["key"] = "value"
+    assert maya_file.is_modified()
+    assert maya_file.save()
+    assert parser.maya_header_parser(scene).get_fileinfo("key") == "value"
+
+
+def test_save_through_symlink(scene, tmp_path):
+    body = read_body(scene)
+    link = str(tmp_path / f"latest{os.path.splitext(scene)[1]}")
+    os.symlink(scene, link)
+
+    maya_file = parser.maya_header_parser(link)
+    maya_file.set_fileinfo("key", "value")
+    assert maya_file.save()
+
+    assert os.path.islink(link)
+    assert parser.maya_header_parser(scene).get_fileinfo("key") == "value"
+    assert read_body(scene) == body
+
+
+def test_failed_copy_leaves_file_untouched(scene, monkeypatch):
+    data = read_bytes(scene)
+
+    def fail(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    for name in ("_copy_file_range", "_sendfile", "_read_write"):
+        monkeypatch.setattr(file_utils, name, fail)
+
+    maya_file = parser.maya_header_parser(scene)
+    maya_file.set_fileinfo("key", "value")
+    with pytest.raises(OSError):
+        maya_file.save()
+    assert read_bytes(scene) == data
+
+
+def test_ascii_bom_and_crlf(tmp_path):
+    filename = str(tmp_path / "scene.ma")
+    generate.write_scene(filename, body_size=BODY_SIZE)
+    data = codecs.BOM_UTF8 + read_bytes(filename).replace(b"\n", b"\r\n")
+    with open(filename, "wb") as file_obj:
+        file_obj.write(data)
+    body = read_body(filename)
+
+    maya_file = parser.maya_header_parser(filename)
+    maya_file.set_fileinfo("key", "value")
+    assert maya_file.save()
+
+    saved_data = read_bytes(filename)
+    assert saved_data.startswith(codecs.BOM_UTF8 + b"//Maya ASCII")
+    assert saved_data.count(b"\n") == saved_data.count(b"\r\n")
+    assert parser.maya_header_parser(filename).get_fileinfo("key") == "value"
+    assert read_body(filename) == body
+
+
+def test_ascii_empty_scene_keeps_end_comment(tmp_path):
+    filename = str(tmp_path / "scene.ma")
+    generate.write_scene(filename, body_size=BODY_SIZE)
+    data = read_bytes(filename)
+    with open(filename, "wb") as file_obj:
+        file_obj.write(data[:data.index(b"createNode")] + b"// End of scene.ma\n")
+
+    maya_file = parser.maya_header_parser(filename)
+    maya_file.set_fileinfo("key", "value")
+    assert maya_file.save()
+    assert read_bytes(filename).endswith(b"\n// End of scene.ma\n")
+
+
+def _pipe(data: bytes, first_write_size: int = None):
+    """
+    Get a file object for the read end of a pipe that gets data written to it from a thread
+    :param first_write_size: Write this many bytes first and the rest a moment later, so the first read comes up short
+    """
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with open(write_fd, "wb", buffering=0) as file_obj:
+            if first_write_size:
+                file_obj.write(data[:first_write_size])
+                time.sleep(0.1)
+            file_obj.write(data[first_write_size:])
+
+    threading.Thread(target=write, daemon=True).start()
+    return open(read_fd, "rb", buffering=0)
+
+
+@pytest.mark.parametrize("source_type", ["bytes", "bytesio", "pipe", "pipe_short_write"])
+def test_save_as_from_other_sources(scene, tmp_path, source_type):
+    data = read_bytes(scene)
+    body = read_body(scene)
+    if source_type == "bytes":
+        source = data
+    elif source_type == "bytesio":
+        source = io.BytesIO(data)
+    elif source_type == "pipe":
+        source = _pipe(data)
+    else:
+        source = _pipe(data, first_write_size=5)
+
+    maya_file = parser.maya_header_parser(source)
+    maya_file.set_fileinfo("key", "value")
+    filename = str(tmp_path / f"copy{os.path.splitext(scene)[1]}")
+    maya_file.save_as(filename)
+
+    assert parser.maya_header_parser(filename).get_fileinfo("key") == "value"
+    assert read_body(filename) == body
+
+    if source_type.startswith("pipe"):
+        with pytest.raises(ValueError):
+            maya_file.save_as(filename)
+        source.close()